@@ -0,0 +1,231 @@
+import argparse
+import json
+import multiprocessing
+import sys
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import degrees
+
+from cache import PathCache
+from nameindex import NameIndex
+
+# NameIndex used to resolve names with no exact match, if enabled
+name_index = None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Answer many degrees-of-separation queries "
+                    "against one loaded graph."
+    )
+    parser.add_argument("directory", help="directory with the CSV files")
+    parser.add_argument("--input", default="-",
+                        help="JSON lines file of queries, or - for stdin")
+    parser.add_argument("--http", type=int, metavar="PORT",
+                        help="serve queries over HTTP on localhost:PORT")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes")
+    parser.add_argument("--cache", type=int, default=0, metavar="SIZE",
+                        help="keep an LRU cache of SIZE searched paths")
+    parser.add_argument("--trees", metavar="FILE",
+                        help="precomputed BFS trees written by cache.py")
+    parser.add_argument("--names", metavar="FILE",
+                        help="resolve unknown names by prefix and fuzzy "
+                             "match, using the name index in FILE "
+                             "(built if missing)")
+    args = parser.parse_args()
+
+    # Load once up front so the snapshot and name index exist
+    # before workers open them
+    init_worker(args.directory, args.cache, args.trees, args.names)
+
+    if args.workers > 1:
+        pool = multiprocessing.Pool(
+            args.workers, initializer=init_worker,
+            initargs=(args.directory, args.cache, args.trees, args.names)
+        )
+    else:
+        pool = None
+
+    try:
+        if args.http is not None:
+            serve(args.http, pool)
+        elif args.input == "-":
+            run_batch(sys.stdin, sys.stdout, pool)
+        else:
+            with open(args.input, encoding="utf-8") as f:
+                run_batch(f, sys.stdout, pool)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def init_worker(directory, cache_size=0, trees=None, names=None):
+    """
+    Loads the graph in a worker process. The snapshot is memory-mapped,
+    so all workers share one copy of it through the page cache.
+
+    A path cache is set up if `cache_size` or a `trees` file is given,
+    and a name index if a `names` file is given.
+    """
+    global name_index
+    degrees.load_data(directory, compact=True)
+    if names:
+        try:
+            name_index = NameIndex.load(names)
+        except FileNotFoundError:
+            name_index = NameIndex.from_graph(degrees.graph)
+            name_index.save(names)
+    if cache_size or trees:
+        degrees.path_cache = PathCache(degrees.search, cache_size)
+        if trees:
+            degrees.path_cache.load_trees(trees)
+
+
+def run_batch(lines, out, pool=None):
+    """
+    Answers each JSON query line in `lines`, writing one JSON result
+    line to `out` per query, in input order, as soon as it is ready.
+    """
+    queries = (line for line in lines if line.strip())
+    if pool is None:
+        results = map(answer_line, queries)
+    else:
+        results = pool.imap(answer_line, queries, chunksize=16)
+    for result in results:
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+
+
+def answer_line(line):
+    """
+    Answers one query given as a line of JSON.
+    """
+    try:
+        query = json.loads(line)
+    except ValueError:
+        return {"error": "invalid JSON"}
+    if not isinstance(query, dict):
+        return {"error": "query must be a JSON object"}
+    return answer(query)
+
+
+def answer(query):
+    """
+    Answers a query dict with "source" and "target" names or person ids.
+
+    Returns a dict echoing the query with either "degrees" and "path"
+    (None if not connected) or an "error" message.
+    """
+    result = {"source": query.get("source"), "target": query.get("target")}
+    ids = []
+    for key in ("source", "target"):
+        value = query.get(key)
+        if not isinstance(value, str):
+            result["error"] = f"missing {key}"
+            return result
+        person_ids = resolve(value)
+        if not person_ids:
+            result["error"] = f"{key} not found"
+            return result
+        if len(person_ids) > 1:
+            result[f"{key}_candidates"] = person_ids
+        ids.append(person_ids[0])
+
+    path = degrees.shortest_path(ids[0], ids[1])
+    if path is None:
+        result["degrees"] = None
+        result["path"] = None
+    else:
+        result["degrees"] = len(path)
+        result["path"] = [{"movie_id": movie_id, "person_id": person_id}
+                          for movie_id, person_id in path]
+    return result
+
+
+def resolve(value):
+    """
+    Returns the person ids matching `value`, which is either a person id
+    or a name, best match first.
+
+    Names with no exact match fall back to `name_index` lookup, if enabled.
+    """
+    if degrees.graph.person_index(value) is not None:
+        return [value]
+    person_ids = degrees.person_ids_for_name(value)
+    if not person_ids and name_index is not None:
+        person_ids = name_index.lookup(value)
+    return person_ids
+
+
+def serve(port, pool=None):
+    """
+    Serves queries on localhost:`port` until interrupted.
+
+        GET /path?source=...&target=...    answers one query
+        POST /batch                        answers a body of JSON lines,
+                                           streaming JSON lines back
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != "/path":
+                self.send_error(404)
+                return
+            params = parse_qs(url.query)
+            query = {key: values[0] for key, values in params.items()}
+            if pool is None:
+                result = answer(query)
+            else:
+                result = pool.apply(answer, (query,))
+            body = json.dumps(result).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/batch":
+                self.send_error(404)
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            lines = self.rfile.read(length).decode("utf-8").splitlines()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            out = _Writer(self.wfile)
+            run_batch(lines, out, pool)
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    print(f"Serving on http://127.0.0.1:{port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+class _Writer():
+    """
+    Text adapter over a binary response stream for `run_batch`.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        self.stream.write(text.encode("utf-8"))
+
+    def flush(self):
+        self.stream.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import time
+
+from collections import deque
+from itertools import accumulate
+
+import degrees
+import snapshot
+
+
+def generate(directory, people=10000, movies=5000, cast=8,
+             distribution="powerlaw", alpha=1.1, seed=0):
+    """
+    Writes synthetic people.csv, movies.csv and stars.csv to `directory`.
+
+    Each movie gets a cast of about `cast` people. With the "uniform"
+    distribution cast sizes and cast members are uniform. With
+    "powerlaw", cast sizes and how often each person is cast both follow
+    a Zipf law with exponent `alpha`, giving a few prolific hubs and a
+    long tail.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+
+    with open(os.path.join(directory, "people.csv"), "w",
+              encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(["id", "name", "birth"])
+        for i in range(people):
+            writer.writerow([i + 1, f"Person {i + 1}", 1900 + i % 100])
+
+    with open(os.path.join(directory, "movies.csv"), "w",
+              encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(["id", "title", "year"])
+        for i in range(movies):
+            writer.writerow([i + 1, f"Movie {i + 1}", 1950 + i % 70])
+
+    if distribution == "powerlaw":
+        weights = list(accumulate(1 / (rank ** alpha)
+                                  for rank in range(1, people + 1)))
+        # Shuffle which ids are the hubs
+        ids = list(range(1, people + 1))
+        rng.shuffle(ids)
+    elif distribution != "uniform":
+        raise ValueError(f"unknown distribution {distribution}")
+
+    with open(os.path.join(directory, "stars.csv"), "w",
+              encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for movie_id in range(1, movies + 1):
+            if distribution == "uniform":
+                size = rng.randint(1, 2 * cast - 1)
+                stars = rng.sample(range(1, people + 1), min(size, people))
+            else:
+                size = min(people, max(1, int(cast * rng.paretovariate(2.0)
+                                              / 2)))
+                stars = {ids[i] for i in rng.choices(
+                    range(people), cum_weights=weights, k=size
+                )}
+            for person_id in stars:
+                writer.writerow([person_id, movie_id])
+
+
+def run(directory, queries=50, seed=0):
+    """
+    Times loading, neighbor expansion and shortest-path search on the
+    dataset in `directory` and returns the results as a dict.
+
+    Queries are grouped by the degrees of separation between their
+    endpoints, so slowdowns at long distances stay visible.
+    """
+    rng = random.Random(seed)
+    results = {
+        "directory": directory,
+        "python": platform.python_version(),
+        "load": {}
+    }
+
+    # Loading, for each backend; the compact backend is timed building the
+    # snapshot and then opening it
+    _reset()
+    results["load"]["dict"] = _timed(
+        lambda: degrees.load_data(directory, compact=False)
+    )
+    person_ids = list(degrees.people)
+
+    try:
+        os.remove(snapshot.snapshot_path(directory))
+    except FileNotFoundError:
+        pass
+    results["load"]["compact_build"] = _timed(
+        lambda: degrees.load_data(directory, compact=True)
+    )
+    results["load"]["compact_snapshot"] = _timed(
+        lambda: degrees.load_data(directory, compact=True)
+    )
+
+    sample = rng.sample(person_ids, min(queries, len(person_ids)))
+    pairs = _pairs_by_distance(sample, rng)
+    results["graph"] = {
+        "people": len(person_ids),
+        "movies": len(degrees.movies),
+        "stars": sum(len(movie["stars"]) for movie in degrees.movies.values())
+    }
+
+    for backend, compact in (("dict", False), ("compact", True)):
+        if compact:
+            degrees.load_data(directory, compact=True)
+        else:
+            degrees.graph = None
+
+        results[backend] = {
+            "neighbors_for_person": _timed(
+                lambda: [degrees.neighbors_for_person(person_id)
+                         for person_id in sample],
+                count=len(sample)
+            ),
+            "shortest_path": {}
+        }
+        for distance, group in sorted(pairs.items()):
+            timings = {}
+            for mode, bidirectional in (("bfs", False),
+                                        ("bidirectional", True)):
+                if compact and not bidirectional:
+                    continue
+                timings[mode] = _timed(
+                    lambda: [degrees.shortest_path(source, target,
+                                                   bidirectional)
+                             for source, target in group],
+                    count=len(group)
+                )
+            results[backend]["shortest_path"][str(distance)] = timings
+
+    return results
+
+
+def _pairs_by_distance(sources, rng):
+    """
+    Returns a dict mapping each distance to (source, target) pairs at that
+    many degrees of separation, one target per reachable distance per
+    source.
+    """
+    pairs = {}
+    for source in sources:
+        layers = {}
+        depth = {source: 0}
+        queue = deque([source])
+        while queue:
+            person_id = queue.popleft()
+            for _, neighbor_id in degrees.neighbors_for_person(person_id):
+                if neighbor_id not in depth:
+                    depth[neighbor_id] = depth[person_id] + 1
+                    layers.setdefault(depth[neighbor_id], []).append(
+                        neighbor_id
+                    )
+                    queue.append(neighbor_id)
+        for distance, layer in layers.items():
+            pairs.setdefault(distance, []).append((source, rng.choice(layer)))
+    return pairs
+
+
+def _timed(function, count=1):
+    """
+    Calls `function` once and returns its timing as a dict.
+    """
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    return {"count": count, "seconds": elapsed,
+            "seconds_each": elapsed / count if count else 0.0}
+
+
+def _reset():
+    """
+    Empties the dicts filled by `degrees.load_data`.
+    """
+    degrees.names.clear()
+    degrees.people.clear()
+    degrees.movies.clear()
+    degrees.graph = None
+    degrees.path_cache = None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark degrees on a synthetic dataset."
+    )
+    parser.add_argument("directory",
+                        help="directory to write the synthetic CSVs to")
+    parser.add_argument("--people", type=int, default=10000)
+    parser.add_argument("--movies", type=int, default=5000)
+    parser.add_argument("--cast", type=int, default=8,
+                        help="typical number of stars per movie")
+    parser.add_argument("--distribution", default="powerlaw",
+                        choices=["powerlaw", "uniform"])
+    parser.add_argument("--alpha", type=float, default=1.1,
+                        help="Zipf exponent for the powerlaw distribution")
+    parser.add_argument("--queries", type=int, default=50,
+                        help="number of query sources to sample")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark.json",
+                        help="file to write the JSON results to")
+    args = parser.parse_args()
+
+    generate(args.directory, args.people, args.movies, args.cast,
+             args.distribution, args.alpha, args.seed)
+    results = run(args.directory, args.queries, args.seed)
+    results["parameters"] = vars(args)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
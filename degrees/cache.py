@@ -0,0 +1,185 @@
+import argparse
+import pickle
+import threading
+
+from collections import OrderedDict, deque
+
+import degrees
+
+# Version of the pickled tree file format
+VERSION = 1
+
+
+class PathCache():
+    """
+    Answers shortest-path queries from precomputed single-source BFS trees
+    for a set of hot people, falling back to an LRU cache of searched paths.
+
+    Co-starring is symmetric, so a tree rooted at either the source or the
+    target answers a query.
+    """
+
+    def __init__(self, search, maxsize=4096):
+        """
+        `search(source, target, bidirectional)` is called on a cache miss.
+        At most `maxsize` searched paths are kept.
+        """
+        self.search = search
+        self.maxsize = maxsize
+        self.paths = OrderedDict()
+        self.lock = threading.Lock()
+        # Maps a root person_id to {person_id: (movie_id, parent_id)}
+        self.trees = {}
+        self.hits = 0
+        self.tree_hits = 0
+        self.misses = 0
+
+    def shortest_path(self, source, target, bidirectional=False):
+        """
+        Returns the same result as `degrees.shortest_path`. Misses are
+        searched with `bidirectional` passed through; cached paths and
+        tree paths are shortest paths, so they answer either kind of
+        query.
+        """
+        if source in self.trees:
+            with self.lock:
+                self.tree_hits += 1
+            return _tree_path(self.trees[source], target, reverse=True)
+        if target in self.trees:
+            with self.lock:
+                self.tree_hits += 1
+            return _tree_path(self.trees[target], source, reverse=False)
+
+        key = (source, target)
+        with self.lock:
+            if key in self.paths:
+                self.hits += 1
+                self.paths.move_to_end(key)
+                path = self.paths[key]
+                return None if path is None else list(path)
+            self.misses += 1
+
+        path = self.search(source, target, bidirectional)
+        with self.lock:
+            self.paths[key] = path
+            while len(self.paths) > self.maxsize:
+                self.paths.popitem(last=False)
+        return None if path is None else list(path)
+
+    def info(self):
+        """
+        Returns a dict of hit/miss counters and cache sizes.
+        """
+        return {
+            "hits": self.hits,
+            "tree_hits": self.tree_hits,
+            "misses": self.misses,
+            "size": len(self.paths),
+            "maxsize": self.maxsize,
+            "trees": len(self.trees)
+        }
+
+    def clear(self):
+        """
+        Empties the LRU cache and resets the counters, keeping the trees.
+        """
+        with self.lock:
+            self.paths.clear()
+            self.hits = self.tree_hits = self.misses = 0
+
+    def precompute(self, sources, neighbors):
+        """
+        Builds a BFS tree for each person_id in `sources`, using
+        `neighbors(person_id)` to expand people.
+        """
+        for source in sources:
+            self.trees[source] = bfs_tree(source, neighbors)
+
+    def save_trees(self, path):
+        """
+        Writes the precomputed trees to `path`.
+        """
+        with open(path, "wb") as f:
+            pickle.dump({"version": VERSION, "trees": self.trees}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load_trees(self, path):
+        """
+        Adds the trees stored at `path` to the cache.
+        """
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if data.get("version") != VERSION:
+            raise ValueError(f"unsupported tree file version in {path}")
+        self.trees.update(data["trees"])
+
+
+def bfs_tree(source, neighbors):
+    """
+    Returns a map from every person reachable from `source` to the
+    (movie_id, person_id) they were first reached from. The source
+    maps to None.
+    """
+    parents = {source: None}
+    queue = deque([source])
+    while queue:
+        person_id = queue.popleft()
+        for (movie_id, neighbor_id) in neighbors(person_id):
+            if neighbor_id not in parents:
+                parents[neighbor_id] = (movie_id, person_id)
+                queue.append(neighbor_id)
+    return parents
+
+
+def _tree_path(parents, person_id, reverse):
+    """
+    Returns the (movie_id, person_id) path between the root of `parents`
+    and `person_id`, or None if they are not connected.
+
+    With `reverse` the path runs from the root to `person_id`,
+    otherwise from `person_id` to the root.
+    """
+    if person_id not in parents:
+        return None
+    path = []
+    while parents[person_id] is not None:
+        movie_id, parent_id = parents[person_id]
+        if reverse:
+            path.append((movie_id, person_id))
+        else:
+            path.append((movie_id, parent_id))
+        person_id = parent_id
+    if reverse:
+        path.reverse()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Precompute BFS trees for hot people."
+    )
+    parser.add_argument("directory", help="directory with the CSV files")
+    parser.add_argument("output", help="file to write the trees to")
+    parser.add_argument("person_ids", nargs="*",
+                        help="people to build trees for")
+    parser.add_argument("--top", type=int, default=0,
+                        help="also build trees for the N people "
+                             "with the most movies")
+    args = parser.parse_intermixed_args()
+
+    degrees.load_data(args.directory, compact=True)
+    graph = degrees.graph
+    sources = list(args.person_ids)
+    if args.top:
+        ranked = sorted(range(len(graph.person_ids)),
+                        key=lambda p: len(graph.movies_of(p)), reverse=True)
+        sources.extend(graph.person_ids[p] for p in ranked[:args.top])
+
+    cache = PathCache(degrees.search)
+    cache.precompute(sources, degrees.neighbors_for_person)
+    cache.save_trees(args.output)
+    print(f"Wrote {len(cache.trees)} trees to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
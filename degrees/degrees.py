@@ -1,6 +1,9 @@
 import csv
 import sys
 
+import ingest
+
+from snapshot import load_graph
 from util import Node, StackFrontier, QueueFrontier
 
 # Maps names to a set of corresponding person_ids
@@ -12,11 +15,40 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# CompactGraph used instead of the dicts above unless loaded with compact=False
+graph = None
+
+# Optional cache.PathCache consulted by shortest_path before searching
+path_cache = None
+
 
-def load_data(directory):
+def load_data(directory, compact=True, workers=1):
     """
     Load data from CSV files into memory.
+
+    By default, load into an integer-indexed `CompactGraph`, opening the
+    binary snapshot in `directory` when it is newer than the CSV files
+    and (re)building it otherwise. If `compact` is False, fill the
+    `names`, `people` and `movies` dicts instead.
+
+    If `workers` is not 1, the CSV files are parsed in chunks by that many
+    processes (None for one per core).
     """
+    global graph
+    if compact:
+        graph = load_graph(directory, workers)
+        return
+    graph = None
+
+    if workers != 1:
+        loaded_names, loaded_people, loaded_movies, _ = ingest.load_dicts(
+            directory, workers
+        )
+        names.update(loaded_names)
+        people.update(loaded_people)
+        movies.update(loaded_movies)
+        return
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -53,13 +85,20 @@ def load_data(directory):
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    args = sys.argv[1:]
+
+    # The compact graph is the default so that runs after the first one
+    # open the snapshot instead of parsing the CSV files again; --dicts
+    # loads the original dicts (--compact is kept for old scripts)
+    compact = "--dicts" not in args
+    args = [arg for arg in args if arg not in ("--dicts", "--compact")]
+    if len(args) > 1:
+        sys.exit("Usage: python degrees.py [--dicts] [directory]")
+    directory = args[0] if len(args) == 1 else "large"
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(directory, compact=compact)
     print("Data loaded.")
 
     source = person_id_for_name(input("Name: "))
@@ -69,7 +108,7 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    path = shortest_path(source, target, bidirectional=True)
 
     if path is None:
         print("Not connected.")
@@ -78,19 +117,36 @@ def main():
         print(f"{degrees} degrees of separation.")
         path = [(None, source)] + path
         for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
+            person1 = person(path[i][1])["name"]
+            person2 = person(path[i + 1][1])["name"]
+            movie = movie_for_id(path[i + 1][0])["title"]
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, bidirectional=False):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
+    If `bidirectional` is True, searches from both ends at once
+    (see `bidirectional_shortest_path`).
+
     If no possible path, returns None.
     """
+    if path_cache is not None:
+        return path_cache.shortest_path(source, target, bidirectional)
+    return search(source, target, bidirectional)
+
+
+def search(source, target, bidirectional=False):
+    """
+    Searches for the path returned by `shortest_path`,
+    bypassing `path_cache`.
+    """
+    if graph is not None:
+        return graph.shortest_path(source, target)
+    if bidirectional:
+        return bidirectional_shortest_path(source, target)
 
     queue = QueueFrontier()
     queue.add(Node(source, None, None))
@@ -99,7 +155,7 @@ def shortest_path(source, target):
         node = queue.remove()
         visited.add(node.state)
         for (movie, person) in neighbors_for_person(node.state):
-            if (node.state != person) and (person not in visited):
+            if (person not in visited) and not queue.contains_state(person):
                 queue.add(Node(person, node, movie))
         if node.state == target:
             path = []
@@ -111,20 +167,91 @@ def shortest_path(source, target):
     return None
 
 
-def person_id_for_name(name):
+def bidirectional_shortest_path(source, target):
+    """
+    Returns the same result as `shortest_path`, but grows one BFS
+    frontier from the source and one from the target, always expanding
+    the smaller of the two by a full layer, until they meet.
+
+    Goal checks happen when a person is generated rather than when it is
+    dequeued, so the first meeting found is a shortest connection.
+    """
+    if source == target:
+        return []
+
+    # Map each reached person to the (movie_id, person_id) they were reached
+    # from, one map per search direction
+    forward = {source: None}
+    backward = {target: None}
+    forward_layer = [source]
+    backward_layer = [target]
+
+    while forward_layer and backward_layer:
+
+        # Expand whichever side has the smaller frontier
+        if len(forward_layer) <= len(backward_layer):
+            layer, parents, others = forward_layer, forward, backward
+        else:
+            layer, parents, others = backward_layer, backward, forward
+
+        next_layer = []
+        for person_id in layer:
+            for (movie_id, neighbor_id) in neighbors_for_person(person_id):
+                if neighbor_id in parents:
+                    continue
+                parents[neighbor_id] = (movie_id, person_id)
+                if neighbor_id in others:
+                    return _join_paths(forward, backward, neighbor_id)
+                next_layer.append(neighbor_id)
+
+        if parents is forward:
+            forward_layer = next_layer
+        else:
+            backward_layer = next_layer
+
+    return None
+
+
+def _join_paths(forward, backward, meeting):
+    """
+    Builds the (movie_id, person_id) path through `meeting` from the
+    parent maps of a bidirectional search.
+    """
+    path = []
+    person_id = meeting
+    while forward[person_id] is not None:
+        movie_id, parent_id = forward[person_id]
+        path.append((movie_id, person_id))
+        person_id = parent_id
+    path.reverse()
+
+    person_id = meeting
+    while backward[person_id] is not None:
+        movie_id, child_id = backward[person_id]
+        path.append((movie_id, child_id))
+        person_id = child_id
+    return path
+
+
+def person_id_for_name(name, interactive=True):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    If `interactive` is False, ambiguities are resolved without prompting
+    by picking the person who starred in the most movies.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    person_ids = person_ids_for_name(name)
     if len(person_ids) == 0:
         return None
+    elif len(person_ids) > 1 and not interactive:
+        return person_ids[0]
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
         for person_id in person_ids:
-            person = people[person_id]
-            name = person["name"]
-            birth = person["birth"]
+            details = person(person_id)
+            name = details["name"]
+            birth = details["birth"]
             print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
         try:
             person_id = input("Intended Person ID: ")
@@ -137,11 +264,27 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def person_ids_for_name(name):
+    """
+    Returns the IMDB ids of everyone named `name`, ignoring case,
+    ranked by how many movies they starred in.
+    """
+    if graph is not None:
+        person_ids = graph.person_ids_for_name(name)
+    else:
+        person_ids = list(names.get(name.lower(), set()))
+    person_ids.sort(key=lambda person_id: len(person(person_id)["movies"]),
+                    reverse=True)
+    return person_ids
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return graph.neighbors_for_person(person_id)
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -150,5 +293,23 @@ def neighbors_for_person(person_id):
     return neighbors
 
 
+def person(person_id):
+    """
+    Returns the name, birth and movies of a person.
+    """
+    if graph is not None:
+        return graph.person(person_id)
+    return people[person_id]
+
+
+def movie_for_id(movie_id):
+    """
+    Returns the title, year and stars of a movie.
+    """
+    if graph is not None:
+        return graph.movie(movie_id)
+    return movies[movie_id]
+
+
 if __name__ == "__main__":
     main()
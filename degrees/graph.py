@@ -0,0 +1,351 @@
+import csv
+
+from array import array
+from bisect import bisect_left
+
+
+class CompactGraph():
+    """
+    Person-movie graph with IDs interned to integers.
+
+    People and movies are numbered in sorted order of their IMDB id, and the
+    bipartite star relation is kept as CSR adjacency in both directions:
+    the movies of person `p` are
+        person_movies[person_offsets[p]:person_offsets[p + 1]]
+    and the stars of movie `m` are
+        movie_stars[movie_offsets[m]:movie_offsets[m + 1]].
+
+    `name_order` holds person indices sorted by lowercase name, so name
+    lookups are a binary search instead of a dict of sets.
+
+    Any sequence type works for the tables (lists, `array`s, memoryviews),
+    which lets the same search code run over a memory-mapped snapshot.
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 person_offsets, person_movies,
+                 movie_ids, movie_titles, movie_years,
+                 movie_offsets, movie_stars, name_order):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+        self.name_order = name_order
+
+    @classmethod
+    def from_csv(cls, directory):
+        """
+        Builds a graph straight from the CSV files in `directory`, without
+        creating the intermediate dicts used by `degrees.load_data`.
+        """
+        with open(f"{directory}/people.csv", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            next(reader)
+            people = [(row[0], row[1], row[2]) for row in reader]
+
+        with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            next(reader)
+            movies = [(row[0], row[1], row[2]) for row in reader]
+
+        with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            next(reader)
+            stars = [(row[0], row[1]) for row in reader]
+
+        return cls.from_rows(people, movies, stars)
+
+    @classmethod
+    def from_dicts(cls, people, movies):
+        """
+        Builds a graph from the `people` and `movies` dicts filled in by
+        `degrees.load_data`.
+        """
+        return cls.from_rows(
+            [(person_id, person["name"], person["birth"])
+             for person_id, person in people.items()],
+            [(movie_id, movie["title"], movie["year"])
+             for movie_id, movie in movies.items()],
+            [(person_id, movie_id)
+             for person_id, person in people.items()
+             for movie_id in person["movies"]]
+        )
+
+    @classmethod
+    def from_rows(cls, people, movies, stars):
+        """
+        Builds a graph from `people` (id, name, birth) and `movies`
+        (id, title, year) rows in file order, and `stars`
+        (person_id, movie_id) rows. As in `degrees.load_data`, later rows
+        win for duplicate ids, and star rows naming an unknown person or
+        movie are skipped.
+        """
+        people = unique_rows(people)
+        movies = unique_rows(movies)
+        person_index = {row[0]: i for i, row in enumerate(people)}
+        movie_index = {row[0]: i for i, row in enumerate(movies)}
+
+        # Intern the star pairs, dropping duplicates and dangling references
+        codes = set()
+        for person_id, movie_id in stars:
+            p = person_index.get(person_id)
+            m = movie_index.get(movie_id)
+            if p is not None and m is not None:
+                codes.add(p * len(movies) + m)
+        return cls.from_edges(people, movies, sorted(codes))
+
+    @classmethod
+    def from_edges(cls, people, movies, codes, transposed=None):
+        """
+        Builds a graph from `people` and `movies` rows as returned by
+        `unique_rows` and the sorted list `codes` of distinct star pairs,
+        each packed as `person index * len(movies) + movie index`.
+        `transposed` is the same pairs packed as
+        `movie index * len(people) + person index` and sorted; it is
+        computed from `codes` if not given.
+
+        Packed pairs sort as the pairs do, so the CSR offsets of each
+        side are binary searches into its sorted codes.
+        """
+        person_ids = [row[0] for row in people]
+        movie_ids = [row[0] for row in movies]
+        people_count = len(person_ids)
+        movie_count = len(movie_ids)
+        if transposed is None:
+            transposed = sorted(
+                code % movie_count * people_count + code // movie_count
+                for code in codes
+            )
+
+        person_offsets = array("i", (
+            bisect_left(codes, p * movie_count)
+            for p in range(people_count + 1)
+        ))
+        person_movies = array("i", (code % movie_count for code in codes))
+        movie_offsets = array("i", (
+            bisect_left(transposed, m * people_count)
+            for m in range(movie_count + 1)
+        ))
+        movie_stars = array("i", (code % people_count for code in transposed))
+
+        person_names = [row[1] for row in people]
+        name_order = array("i", sorted(
+            range(len(person_ids)), key=lambda p: person_names[p].lower()
+        ))
+
+        return cls(
+            person_ids, person_names, [row[2] for row in people],
+            person_offsets, person_movies,
+            movie_ids, [row[1] for row in movies], [row[2] for row in movies],
+            movie_offsets, movie_stars, name_order
+        )
+
+    def person_index(self, person_id):
+        """
+        Returns the integer index of `person_id`, or None if unknown.
+        """
+        return _find(self.person_ids, person_id)
+
+    def movie_index(self, movie_id):
+        """
+        Returns the integer index of `movie_id`, or None if unknown.
+        """
+        return _find(self.movie_ids, movie_id)
+
+    def person_ids_for_name(self, name):
+        """
+        Returns the list of person ids whose name matches `name`,
+        ignoring case.
+        """
+        key = name.lower()
+        lo = _name_bound(self.name_order, self.person_names, key)
+        hi = _name_bound(self.name_order, self.person_names, key, lo=lo,
+                         right=True)
+        return [self.person_ids[p] for p in self.name_order[lo:hi]]
+
+    def movies_of(self, p):
+        """
+        Returns the movie indices person index `p` starred in.
+        """
+        return self.person_movies[self.person_offsets[p]:
+                                  self.person_offsets[p + 1]]
+
+    def stars_of(self, m):
+        """
+        Returns the person indices who starred in movie index `m`.
+        """
+        return self.movie_stars[self.movie_offsets[m]:
+                                self.movie_offsets[m + 1]]
+
+    def person(self, person_id):
+        """
+        Returns a dict shaped like `degrees.people[person_id]`.
+        """
+        p = self.person_index(person_id)
+        if p is None:
+            raise KeyError(person_id)
+        return {
+            "name": self.person_names[p],
+            "birth": self.person_births[p],
+            "movies": {self.movie_ids[m] for m in self.movies_of(p)}
+        }
+
+    def movie(self, movie_id):
+        """
+        Returns a dict shaped like `degrees.movies[movie_id]`.
+        """
+        m = self.movie_index(movie_id)
+        if m is None:
+            raise KeyError(movie_id)
+        return {
+            "title": self.movie_titles[m],
+            "year": self.movie_years[m],
+            "stars": {self.person_ids[p] for p in self.stars_of(m)}
+        }
+
+    def neighbors_for_person(self, person_id):
+        """
+        Returns (movie_id, person_id) pairs for people
+        who starred with a given person.
+        """
+        p = self.person_index(person_id)
+        if p is None:
+            raise KeyError(person_id)
+        return {(self.movie_ids[m], self.person_ids[q])
+                for m in self.movies_of(p) for q in self.stars_of(m)}
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target, or None.
+
+        Runs the bidirectional search of `degrees.bidirectional_shortest_path`
+        over integer indices. Each movie's cast is scanned at most once per
+        direction.
+        """
+        s = self.person_index(source)
+        t = self.person_index(target)
+        if s is None or t is None:
+            raise KeyError(source if s is None else target)
+        path = self.index_path(s, t)
+        if path is None:
+            return None
+        return [(self.movie_ids[m], self.person_ids[p]) for m, p in path]
+
+    def index_path(self, s, t):
+        """
+        Returns the shortest list of (movie, person) index pairs connecting
+        person indices `s` and `t`, or None.
+        """
+        if s == t:
+            return []
+
+        forward = {s: None}
+        backward = {t: None}
+        forward_movies = set()
+        backward_movies = set()
+        forward_layer = [s]
+        backward_layer = [t]
+
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+
+        while forward_layer and backward_layer:
+            if len(forward_layer) <= len(backward_layer):
+                layer, parents, others, seen = (
+                    forward_layer, forward, backward, forward_movies
+                )
+            else:
+                layer, parents, others, seen = (
+                    backward_layer, backward, forward, backward_movies
+                )
+
+            next_layer = []
+            for p in layer:
+                for i in range(person_offsets[p], person_offsets[p + 1]):
+                    m = person_movies[i]
+                    if m in seen:
+                        continue
+                    seen.add(m)
+                    for j in range(movie_offsets[m], movie_offsets[m + 1]):
+                        q = movie_stars[j]
+                        if q in parents:
+                            continue
+                        parents[q] = (m, p)
+                        if q in others:
+                            return _join_index_paths(forward, backward, q)
+                        next_layer.append(q)
+
+            if parents is forward:
+                forward_layer = next_layer
+            else:
+                backward_layer = next_layer
+
+        return None
+
+
+def unique_rows(rows):
+    """
+    Returns `rows` sorted by their first field (the id), keeping only the
+    last row for each id, as `degrees.load_data` does.
+    """
+    return sorted(dict((row[0], row) for row in rows).values())
+
+
+def _find(table, key):
+    """
+    Returns the position of `key` in the sorted sequence `table`, or None.
+    """
+    i = bisect_left(table, key)
+    if i < len(table) and table[i] == key:
+        return i
+    return None
+
+
+def _name_bound(order, names, key, lo=0, right=False):
+    """
+    Returns the first position in `order`, from `lo` on, of a person
+    index whose lowercase name in `names` is not less than `key`, or
+    greater than `key` if `right` is True.
+
+    This is `bisect_left`/`bisect_right` with a key function, which the
+    bisect module only accepts from Python 3.10.
+    """
+    hi = len(order)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        other = names[order[mid]].lower()
+        if other < key or (right and other == key):
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _join_index_paths(forward, backward, meeting):
+    """
+    Builds the (movie, person) index path through `meeting` from the
+    parent maps of a bidirectional search.
+    """
+    path = []
+    p = meeting
+    while forward[p] is not None:
+        m, parent = forward[p]
+        path.append((m, p))
+        p = parent
+    path.reverse()
+
+    p = meeting
+    while backward[p] is not None:
+        m, child = backward[p]
+        path.append((m, child))
+        p = child
+    return path
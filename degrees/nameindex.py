@@ -0,0 +1,206 @@
+import heapq
+import pickle
+import unicodedata
+
+from array import array
+from bisect import bisect_left
+
+# Version of the pickled index format
+VERSION = 1
+
+# Length of the character n-grams used for typo-tolerant lookup
+GRAM = 3
+
+# N-grams shared by more names than this are too common to narrow a
+# fuzzy search and are skipped when collecting candidates
+MAX_POSTINGS = 50000
+
+
+class NameIndex():
+    """
+    Index of person names supporting exact, prefix and typo-tolerant
+    lookup without prompting.
+
+    Names are normalized (case, accents, whitespace) and kept sorted, so
+    exact and prefix matches are a binary search. Fuzzy matches are found
+    through a trigram index and confirmed by edit distance. Homonyms are
+    ranked by how many movies each person starred in.
+    """
+
+    def __init__(self, entries):
+        """
+        Builds the index from (person_id, name, film_count) entries.
+        """
+        entries = sorted((normalize(name), person_id, films)
+                         for person_id, name, films in entries)
+        self.keys = [entry[0] for entry in entries]
+        self.person_ids = [entry[1] for entry in entries]
+        self.films = array("i", (entry[2] for entry in entries))
+
+        # Maps each n-gram to the positions of the names containing it
+        self.grams = {}
+        for i, key in enumerate(self.keys):
+            for gram in set(_grams(key)):
+                postings = self.grams.get(gram)
+                if postings is None:
+                    self.grams[gram] = postings = array("i")
+                postings.append(i)
+
+    @classmethod
+    def from_people(cls, people):
+        """
+        Builds an index over the `degrees.people` dict.
+        """
+        return cls((person_id, person["name"], len(person["movies"]))
+                   for person_id, person in people.items())
+
+    @classmethod
+    def from_graph(cls, graph):
+        """
+        Builds an index over a `CompactGraph`.
+        """
+        return cls((graph.person_ids[p], graph.person_names[p],
+                    len(graph.movies_of(p)))
+                   for p in range(len(graph.person_ids)))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads an index written by `save`.
+        """
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if data.get("version") != VERSION:
+            raise ValueError(f"unsupported name index version in {path}")
+        return data["index"]
+
+    def save(self, path):
+        """
+        Writes the index to `path`.
+        """
+        with open(path, "wb") as f:
+            pickle.dump({"version": VERSION, "index": self}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+
+    def exact(self, name):
+        """
+        Returns the person ids named `name`, most films first.
+        """
+        key = normalize(name)
+        lo = bisect_left(self.keys, key)
+        hi = lo
+        while hi < len(self.keys) and self.keys[hi] == key:
+            hi += 1
+        return self._ranked(range(lo, hi), hi - lo)
+
+    def prefix(self, prefix, limit=10):
+        """
+        Returns up to `limit` person ids whose name starts with `prefix`,
+        most films first.
+        """
+        key = normalize(prefix)
+        lo = bisect_left(self.keys, key)
+        hi = bisect_left(self.keys, key + "\U0010ffff", lo=lo)
+        return self._ranked(range(lo, hi), limit)
+
+    def fuzzy(self, name, limit=10, max_distance=None):
+        """
+        Returns up to `limit` person ids whose name is within
+        `max_distance` edits of `name`, closest first and then most films.
+
+        By default one edit is allowed per four characters, at least one.
+        """
+        key = normalize(name)
+        if max_distance is None:
+            max_distance = max(1, len(key) // 4)
+
+        # Each edit destroys at most GRAM n-grams, so a match within
+        # max_distance edits must share this many n-grams with the query
+        grams = set(_grams(key))
+        needed = len(grams) - GRAM * max_distance
+
+        counts = {}
+        skipped = 0
+        for gram in grams:
+            postings = self.grams.get(gram, ())
+            if len(postings) > MAX_POSTINGS:
+                skipped += 1
+                continue
+            for i in postings:
+                counts[i] = counts.get(i, 0) + 1
+
+        scored = []
+        for i, count in counts.items():
+            if count + skipped < needed:
+                continue
+            candidate = self.keys[i]
+            if abs(len(candidate) - len(key)) > max_distance:
+                continue
+            distance = edit_distance(key, candidate, max_distance)
+            if distance <= max_distance:
+                scored.append((distance, -self.films[i], i))
+
+        return [self.person_ids[i]
+                for _, _, i in heapq.nsmallest(limit, scored)]
+
+    def lookup(self, query, limit=10):
+        """
+        Returns up to `limit` person ids for a free-text `query`:
+        exact matches, then prefix matches, then fuzzy matches.
+        """
+        results = self.exact(query)
+        for person_id in self.prefix(query, limit) + self.fuzzy(query, limit):
+            if len(results) >= limit:
+                break
+            if person_id not in results:
+                results.append(person_id)
+        return results[:limit]
+
+    def resolve(self, name):
+        """
+        Returns the single best person id for `name`, or None.
+        """
+        results = self.lookup(name, limit=1)
+        return results[0] if results else None
+
+    def _ranked(self, positions, limit):
+        """
+        Returns the person ids at `positions`, most films first.
+        """
+        best = heapq.nlargest(limit, positions, key=lambda i: self.films[i])
+        return [self.person_ids[i] for i in best]
+
+
+def normalize(name):
+    """
+    Returns `name` lowercased, with accents removed and whitespace collapsed.
+    """
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.lower().split())
+
+
+def edit_distance(a, b, limit):
+    """
+    Returns the Levenshtein distance between `a` and `b`, or `limit + 1`
+    as soon as it is known to exceed `limit`.
+    """
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1,
+                               current[j - 1] + 1,
+                               previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _grams(key):
+    """
+    Returns the n-grams of `key`, padded so short names still have some.
+    """
+    padded = " " * (GRAM - 1) + key + " "
+    return [padded[i:i + GRAM] for i in range(len(padded) - GRAM + 1)]
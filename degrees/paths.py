@@ -0,0 +1,146 @@
+import heapq
+import itertools
+
+from degrees import neighbors_for_person
+
+
+def all_shortest_paths(source, target):
+    """
+    Yields every shortest list of (movie_id, person_id) pairs that
+    connects the source to the target, one at a time.
+
+    A layered BFS records, for each person, every (movie_id, person_id)
+    it can be reached from in the previous layer. Paths are then
+    enumerated depth-first from the target, so only one path is held in
+    memory at a time no matter how many there are.
+    """
+    if source == target:
+        yield []
+        return
+
+    # Maps each reached person to the distance from the source and the
+    # list of (movie_id, person_id) pairs one layer closer to the source
+    depth = {source: 0}
+    parents = {source: []}
+    layer = [source]
+    found = False
+    while layer and not found:
+        next_layer = []
+        for person_id in layer:
+            for (movie_id, neighbor_id) in neighbors_for_person(person_id):
+                if neighbor_id not in depth:
+                    depth[neighbor_id] = depth[person_id] + 1
+                    parents[neighbor_id] = []
+                    next_layer.append(neighbor_id)
+                if depth[neighbor_id] == depth[person_id] + 1:
+                    parents[neighbor_id].append((movie_id, person_id))
+                    if neighbor_id == target:
+                        found = True
+        layer = next_layer
+
+    if not found:
+        return
+
+    # Depth-first walk back from the target; each stack entry is an
+    # iterator over the parents of the person at that depth
+    path = []
+    stack = [iter(parents[target])]
+    person_id = target
+    while stack:
+        step = next(stack[-1], None)
+        if step is None:
+            stack.pop()
+            if path:
+                person_id = path.pop()[1]
+            continue
+        movie_id, parent_id = step
+        path.append((movie_id, person_id))
+        if parent_id == source:
+            yield list(reversed(path))
+            path.pop()
+        else:
+            person_id = parent_id
+            stack.append(iter(parents[parent_id]))
+
+
+def k_shortest_paths(source, target, k):
+    """
+    Yields up to `k` distinct simple paths from the source to the target,
+    shortest first, as lists of (movie_id, person_id) pairs.
+
+    Uses Yen's algorithm: each next path is the shortest deviation from
+    one of the paths already found, with edges those paths took out of the
+    deviation point and the people before it excluded from the search.
+    """
+    if k <= 0:
+        return
+    first = _restricted_path(source, target, set(), set())
+    if first is None:
+        return
+
+    found = [first]
+    yield first
+    candidates = []
+    seen = {tuple(first)}
+    counter = itertools.count()
+
+    while len(found) < k:
+        previous = found[-1]
+        people = [source] + [person_id for _, person_id in previous]
+        for i in range(len(previous)):
+            spur = people[i]
+            root = previous[:i]
+
+            # Edges leaving the spur person along paths sharing this root
+            banned_edges = set()
+            for path in found:
+                if path[:i] == root:
+                    banned_edges.add((spur,) + path[i])
+            banned_people = set(people[:i])
+
+            spur_path = _restricted_path(spur, target,
+                                         banned_people, banned_edges)
+            if spur_path is None:
+                continue
+            candidate = root + spur_path
+            if tuple(candidate) not in seen:
+                seen.add(tuple(candidate))
+                heapq.heappush(candidates,
+                               (len(candidate), next(counter), candidate))
+
+        if not candidates:
+            return
+        path = heapq.heappop(candidates)[2]
+        found.append(path)
+        yield path
+
+
+def _restricted_path(source, target, banned_people, banned_edges):
+    """
+    Returns a shortest (movie_id, person_id) path from source to target
+    that visits none of `banned_people` and uses no
+    (person_id, movie_id, person_id) edge in `banned_edges`, or None.
+    """
+    if source == target:
+        return []
+    parents = {source: None}
+    layer = [source]
+    while layer:
+        next_layer = []
+        for person_id in layer:
+            for (movie_id, neighbor_id) in neighbors_for_person(person_id):
+                if (neighbor_id in parents or neighbor_id in banned_people
+                        or (person_id, movie_id, neighbor_id) in banned_edges):
+                    continue
+                parents[neighbor_id] = (movie_id, person_id)
+                if neighbor_id == target:
+                    path = []
+                    while parents[neighbor_id] is not None:
+                        movie_id, parent_id = parents[neighbor_id]
+                        path.append((movie_id, neighbor_id))
+                        neighbor_id = parent_id
+                    path.reverse()
+                    return path
+                next_layer.append(neighbor_id)
+        layer = next_layer
+    return None
@@ -0,0 +1,244 @@
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+from array import array
+
+import ingest
+
+from graph import CompactGraph
+
+# File name of the snapshot written next to the CSV files
+SNAPSHOT = "degrees.snapshot"
+
+# Magic bytes and format version, followed by the byte order of the writer
+MAGIC = b"DEGSNAP"
+VERSION = 2
+
+# Magic, version, byte order, section count and the CRC-32 of the rest
+# of the file
+PREFIX = struct.Struct("<7sBBII")
+
+# Sections of the snapshot, in file order. String tables are stored as an
+# offsets section ("q") followed by a UTF-8 blob section ("B").
+SECTIONS = [
+    ("person_ids", "s"),
+    ("person_names", "s"),
+    ("person_births", "s"),
+    ("person_offsets", "i"),
+    ("person_movies", "i"),
+    ("movie_ids", "s"),
+    ("movie_titles", "s"),
+    ("movie_years", "s"),
+    ("movie_offsets", "i"),
+    ("movie_stars", "i"),
+    ("name_order", "i"),
+]
+
+CSV_FILES = ["people.csv", "movies.csv", "stars.csv"]
+
+
+class StringTable():
+    """
+    Read-only sequence of strings backed by an offsets array and a
+    UTF-8 blob. Strings are only decoded when indexed.
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+
+def snapshot_path(directory):
+    """
+    Returns the path of the snapshot for the CSV files in `directory`.
+    """
+    return os.path.join(directory, SNAPSHOT)
+
+
+def is_fresh(directory):
+    """
+    Returns True if `directory` has a snapshot at least as new as
+    all of its CSV files.
+    """
+    path = snapshot_path(directory)
+    try:
+        built = os.path.getmtime(path)
+        return all(os.path.getmtime(os.path.join(directory, name)) <= built
+                   for name in CSV_FILES)
+    except OSError:
+        return False
+
+
+def load_graph(directory, workers=1):
+    """
+    Returns a CompactGraph for `directory`, opening its snapshot if fresh.
+
+    Otherwise the graph is built from the CSV files, parsed by `workers`
+    processes, and a new snapshot is written for the next run. Failure to
+    write the snapshot (e.g. a read-only data directory) is not an error.
+    """
+    if is_fresh(directory):
+        try:
+            return open_snapshot(snapshot_path(directory))
+        except ValueError:
+            pass
+    if workers == 1:
+        graph = CompactGraph.from_csv(directory)
+    else:
+        graph = ingest.load_graph(directory, workers)[0]
+    try:
+        write_snapshot(graph, snapshot_path(directory))
+    except OSError:
+        pass
+    return graph
+
+
+def write_snapshot(graph, path):
+    """
+    Writes `graph` to `path` as a binary snapshot.
+
+    The file is written to a temporary name and renamed into place,
+    so readers never see a partial snapshot.
+    """
+    arrays = []
+    for name, kind in SECTIONS:
+        table = getattr(graph, name)
+        if kind == "s":
+            offsets = array("q", [0])
+            blob = bytearray()
+            for value in table:
+                blob += value.encode("utf-8")
+                offsets.append(len(blob))
+            arrays.append(offsets)
+            arrays.append(array("B", blob))
+        else:
+            arrays.append(array(kind, table))
+
+    # Header: PREFIX, then a (start, length in bytes) pair for every
+    # section
+    position = _align(PREFIX.size + 16 * len(arrays))
+    layout = []
+    for data in arrays:
+        size = len(data) * data.itemsize
+        layout.extend((position, size))
+        position = _align(position + size)
+    body = struct.pack(f"<{len(layout)}Q", *layout)
+
+    # The checksum covers the file as written, zero padding included
+    checksum = zlib.crc32(body)
+    position = PREFIX.size + len(body)
+    for data, start in zip(arrays, layout[::2]):
+        checksum = zlib.crc32(bytes(start - position), checksum)
+        checksum = zlib.crc32(data, checksum)
+        position = start + len(data) * data.itemsize
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(PREFIX.pack(MAGIC, VERSION, sys.byteorder == "little",
+                            len(arrays), checksum))
+        f.write(body)
+        for data, start in zip(arrays, layout[::2]):
+            f.seek(start)
+            data.tofile(f)
+    os.replace(temporary, path)
+
+
+def open_snapshot(path):
+    """
+    Memory-maps the snapshot at `path` and returns a CompactGraph whose
+    tables are views into the mapping. Nothing is parsed or copied; the
+    file is only read once to verify its checksum.
+
+    Raises ValueError if the file is not a snapshot this code can read,
+    or if its checksum does not match, so a corrupt table is never used.
+    """
+    with open(path, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    buffer = memoryview(mapping)
+
+    if len(buffer) < PREFIX.size:
+        raise ValueError("not a degrees snapshot")
+    magic, version, little, count, checksum = PREFIX.unpack_from(buffer)
+    if (magic != MAGIC or version != VERSION
+            or little != (sys.byteorder == "little")
+            or array("i").itemsize != 4):
+        raise ValueError("incompatible degrees snapshot")
+
+    # Every section must lie inside the file and hold whole items
+    kinds = []
+    for _, kind in SECTIONS:
+        kinds.extend(["q", "B"] if kind == "s" else [kind])
+    if count != len(kinds):
+        raise ValueError("corrupt degrees snapshot: wrong section count")
+    if len(buffer) < PREFIX.size + 16 * count:
+        raise ValueError("corrupt degrees snapshot: truncated header")
+    if zlib.crc32(buffer[PREFIX.size:]) != checksum:
+        raise ValueError("corrupt degrees snapshot: bad checksum")
+    layout = struct.unpack_from(f"<{2 * count}Q", buffer, PREFIX.size)
+
+    views = []
+    for i, kind in enumerate(kinds):
+        start, size = layout[2 * i], layout[2 * i + 1]
+        if start + size > len(buffer) or size % array(kind).itemsize:
+            raise ValueError("corrupt degrees snapshot: bad section bounds")
+        views.append(buffer[start:start + size].cast(kind))
+
+    tables = {}
+    for name, kind in SECTIONS:
+        if kind == "s":
+            offsets = views.pop(0)
+            blob = views.pop(0)
+            if (len(offsets) < 1 or offsets[0] != 0
+                    or offsets[-1] != len(blob)):
+                raise ValueError("corrupt degrees snapshot: bad strings")
+            tables[name] = StringTable(offsets, blob)
+        else:
+            tables[name] = views.pop(0)
+
+    # Tables that index each other must agree in length
+    people = len(tables["person_ids"])
+    movies = len(tables["movie_ids"])
+    if (len(tables["person_offsets"]) != people + 1
+            or len(tables["movie_offsets"]) != movies + 1
+            or len(tables["name_order"]) != people
+            or any(len(tables[name]) != people
+                   for name in ("person_names", "person_births"))
+            or any(len(tables[name]) != movies
+                   for name in ("movie_titles", "movie_years"))
+            or tables["person_offsets"][people] != len(tables["person_movies"])
+            or tables["movie_offsets"][movies] != len(tables["movie_stars"])):
+        raise ValueError("corrupt degrees snapshot: inconsistent tables")
+    return CompactGraph(**tables)
+
+
+def _align(position):
+    """
+    Rounds `position` up to a multiple of 8 bytes.
+    """
+    return (position + 7) & ~7
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python snapshot.py directory")
+    directory = sys.argv[1]
+    graph = CompactGraph.from_csv(directory)
+    write_snapshot(graph, snapshot_path(directory))
+    print(f"Wrote {snapshot_path(directory)}")
+
+
+if __name__ == "__main__":
+    main()
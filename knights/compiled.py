@@ -0,0 +1,210 @@
+"""
+Compiled evaluation of logic.py sentences
+
+`Sentence.evaluate` walks the sentence tree and looks up every symbol
+by name, once per model. `compile_sentence` instead generates a Python
+function that evaluates the sentence over a sequence of truth values
+indexed by symbol, with one line per distinct sub-sentence.
+
+`compile_batch` generates the same function over NumPy arrays of
+bit-packed models, where bit k of word w of symbol i's array is the
+value of symbol i in model `64 * w + k`, so one pass evaluates the
+sentence in 64 models per word. `columns` builds those arrays for a
+range of the 2 ** n models of n symbols.
+"""
+import itertools
+
+import numpy as np
+
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+
+# Operators of the generated code for bools and for packed arrays
+BOOL_OPS = {
+    "not": "not {}", "and": " and ", "or": " or ",
+    "implies": "(not {}) or {}", "iff": "{} == {}"
+}
+BATCH_OPS = {
+    "not": "~{}", "and": " & ", "or": " | ",
+    "implies": "~{} | {}", "iff": "~({} ^ {})"
+}
+
+# Models evaluated at once by `model_check_batch`
+CHUNK = 1 << 20
+
+ONES = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def compile_sentence(sentence, names=None):
+    """
+    Returns a function of a sequence of truth values, where value i is
+    that of the symbol `names[i]`, that returns the value of `sentence`.
+    `names` defaults to the sorted names of the symbols in `sentence`.
+    """
+    return _compile(sentence, names, BOOL_OPS)
+
+
+def compile_batch(sentence, names=None):
+    """
+    Returns a function of a list of packed arrays, as built by `columns`,
+    that returns the packed array of the values of `sentence`.
+
+    Bits past the last model of a partial word are not meaningful.
+    """
+    evaluate = _compile(sentence, names, BATCH_OPS)
+
+    def evaluate_batch(values):
+        size = len(values[0]) if values else 1
+        return evaluate(values, np.full(size, ONES),
+                        np.zeros(size, dtype=np.uint64))
+    return evaluate_batch
+
+
+def columns(count, start=0, size=None):
+    """
+    Returns the packed arrays of `count` symbols over `size` models,
+    model `start` onwards, where symbol i is true in model m exactly
+    when bit i of m is set. `size` defaults to all 2 ** count models;
+    `start` must be a multiple of 64.
+    """
+    if size is None:
+        size = 2 ** count - start
+    words = np.arange(start // 64, (start + size + 63) // 64,
+                      dtype=np.uint64)
+    arrays = []
+    for i in range(count):
+        if i < 6:
+
+            # Bit i of m only depends on the position k within the word
+            word = sum(1 << k for k in range(64) if k >> i & 1)
+            arrays.append(np.full(len(words), np.uint64(word)))
+        else:
+            bit = (words >> np.uint64(i - 6)) & np.uint64(1)
+            arrays.append(bit * ONES)
+    return arrays
+
+
+def model_check_compiled(knowledge, query):
+    """
+    Checks if knowledge base entails query, evaluating the compiled
+    sentences in every model.
+    """
+    return model_check_all_compiled(knowledge, [query])[0]
+
+
+def model_check_batch(knowledge, query, chunk=CHUNK):
+    """
+    Checks if knowledge base entails query, evaluating the compiled
+    sentences over `chunk` bit-packed models at a time.
+    """
+    return model_check_all_batch(knowledge, [query], chunk)[0]
+
+
+def model_check_all_compiled(knowledge, queries):
+    """
+    Returns a list holding, for each query in `queries`, whether the
+    knowledge base entails it, evaluating the compiled sentences in every
+    model of all their symbols once.
+    """
+    names = _names(knowledge, queries)
+    knowledge = compile_sentence(knowledge, names)
+    queries = [compile_sentence(query, names) for query in queries]
+    entailed = [True] * len(queries)
+    for values in itertools.product((True, False), repeat=len(names)):
+        if not knowledge(values):
+            continue
+        for i, query in enumerate(queries):
+            if entailed[i] and not query(values):
+                entailed[i] = False
+        if not any(entailed):
+            break
+    return entailed
+
+
+def model_check_all_batch(knowledge, queries, chunk=CHUNK):
+    """
+    Returns a list holding, for each query in `queries`, whether the
+    knowledge base entails it, evaluating the compiled sentences over
+    `chunk` bit-packed models at a time.
+    """
+    names = _names(knowledge, queries)
+    total = 2 ** len(names)
+    knowledge = compile_batch(knowledge, names)
+    queries = [compile_batch(query, names) for query in queries]
+    entailed = [True] * len(queries)
+    chunk = max(64, chunk - chunk % 64)
+    for start in range(0, total, chunk):
+        size = min(chunk, total - start)
+        values = columns(len(names), start, size)
+        models = knowledge(values)
+        if size % 64:
+            models[-1] &= np.uint64((1 << size % 64) - 1)
+        if not models.any():
+            continue
+        for i, query in enumerate(queries):
+            if entailed[i] and (models & ~query(values)).any():
+                entailed[i] = False
+        if not any(entailed):
+            break
+    return entailed
+
+
+def _names(knowledge, queries):
+    """
+    Returns the sorted names of the symbols in knowledge and queries.
+    """
+    return sorted(set.union(knowledge.symbols(),
+                            *[query.symbols() for query in queries]))
+
+
+def _compile(sentence, names, ops):
+    """
+    Returns the generated function `evaluate(v, true=True, false=False)`
+    for `sentence`, using the operators `ops`.
+    """
+    if names is None:
+        names = sorted(sentence.symbols())
+    index = {name: i for i, name in enumerate(names)}
+    lines = []
+    seen = dict()
+
+    def emit(sentence):
+        """
+        Emits the lines computing `sentence` and returns an expression
+        for its value.
+        """
+        if isinstance(sentence, Symbol):
+            if sentence.name not in index:
+                raise Exception(f"variable {sentence.name} not in names")
+            return f"v[{index[sentence.name]}]"
+        if sentence in seen:
+            return seen[sentence]
+
+        if isinstance(sentence, Not):
+            expression = ops["not"].format(emit(sentence.operand))
+        elif isinstance(sentence, (And, Or)):
+            if isinstance(sentence, And):
+                parts, joiner, empty = sentence.conjuncts, ops["and"], "true"
+            else:
+                parts, joiner, empty = sentence.disjuncts, ops["or"], "false"
+            parts = [emit(part) for part in parts]
+            expression = joiner.join(parts) if parts else empty
+        elif isinstance(sentence, Implication):
+            expression = ops["implies"].format(emit(sentence.antecedent),
+                                               emit(sentence.consequent))
+        elif isinstance(sentence, Biconditional):
+            expression = ops["iff"].format(emit(sentence.left),
+                                           emit(sentence.right))
+        else:
+            raise TypeError(f"cannot compile {sentence!r}")
+
+        name = f"t{len(lines)}"
+        lines.append(f"    {name} = {expression}")
+        seen[sentence] = name
+        return name
+
+    result = emit(sentence)
+    source = "\n".join(["def evaluate(v, true=True, false=False):"]
+                       + lines + [f"    return {result}"])
+    namespace = dict()
+    exec(source, namespace)
+    return namespace["evaluate"]
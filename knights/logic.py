@@ -1,8 +1,25 @@
 import itertools
+import multiprocessing
+import weakref
 
 
 class Sentence():
 
+    # Sentences other than And are immutable and hash-consed: building one
+    # that is structurally identical to a live one returns that one, so
+    # repeated sub-sentences are shared. Keys are the class and the
+    # identities of the parts, which are themselves shared.
+    _interned = weakref.WeakValueDictionary()
+
+    # True if the sentence is or contains an And, which can still change
+    _mutable = False
+
+    # Cached hash and frozenset of symbols, None until computed; only
+    # kept if no part of the sentence can change
+    _cacheable = False
+    _hash = None
+    _symbols = None
+
     def evaluate(self, model):
         """Evaluates the logical sentence."""
         raise Exception("nothing to evaluate")
@@ -20,6 +37,43 @@ class Sentence():
         if not isinstance(sentence, Sentence):
             raise TypeError("must be a logical sentence")
 
+    @classmethod
+    def intern(cls, key):
+        """Returns the live sentence stored under key, or a new one."""
+        sentence = Sentence._interned.get(key)
+        if sentence is None:
+            sentence = object.__new__(key[0])
+            Sentence._interned[key] = sentence
+        return sentence
+
+    def _built(self):
+        """Checks if __init__ already ran on an interned sentence."""
+        return "_mutable" in vars(self)
+
+    def _freeze(self, *parts):
+        """Records whether the sentence can change through its parts."""
+        self._mutable = any(part._mutable for part in parts)
+        self._cacheable = not self._mutable
+
+    def _memo(self, attribute, compute):
+        """Returns a cached attribute, computing it if needed."""
+        value = getattr(self, attribute)
+        if value is None:
+            value = compute()
+            if self._cacheable:
+                setattr(self, attribute, value)
+        return value
+
+    def _symbol_set(self):
+        """Returns a frozenset of all symbols in the logical sentence."""
+        return frozenset(self.symbols())
+
+    def __getstate__(self):
+        state = vars(self).copy()
+        state.pop("_hash", None)
+        state.pop("_symbols", None)
+        return state
+
     @classmethod
     def parenthesize(cls, s):
         """Parenthesizes an expression if not already parenthesized."""
@@ -44,14 +98,23 @@ class Sentence():
 
 class Symbol(Sentence):
 
+    def __new__(cls, name):
+        return Sentence.intern((cls, name))
+
     def __init__(self, name):
+        if self._built():
+            return
         self.name = name
+        self._freeze()
+
+    def __reduce__(self):
+        return (type(self), (self.name,))
 
     def __eq__(self, other):
         return isinstance(other, Symbol) and self.name == other.name
 
     def __hash__(self):
-        return hash(("symbol", self.name))
+        return self._memo("_hash", lambda: hash(("symbol", self.name)))
 
     def __repr__(self):
         return self.name
@@ -68,17 +131,29 @@ class Symbol(Sentence):
     def symbols(self):
         return {self.name}
 
+    def _symbol_set(self):
+        return self._memo("_symbols", lambda: frozenset([self.name]))
+
 
 class Not(Sentence):
+    def __new__(cls, operand):
+        return Sentence.intern((cls, id(operand)))
+
     def __init__(self, operand):
+        if self._built():
+            return
         Sentence.validate(operand)
         self.operand = operand
+        self._freeze(operand)
+
+    def __reduce__(self):
+        return (type(self), (self.operand,))
 
     def __eq__(self, other):
         return isinstance(other, Not) and self.operand == other.operand
 
     def __hash__(self):
-        return hash(("not", hash(self.operand)))
+        return self._memo("_hash", lambda: hash(("not", hash(self.operand))))
 
     def __repr__(self):
         return f"Not({self.operand})"
@@ -90,22 +165,29 @@ class Not(Sentence):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
     def symbols(self):
-        return self.operand.symbols()
+        return set(self._symbol_set())
+
+    def _symbol_set(self):
+        return self._memo("_symbols", self.operand._symbol_set)
 
 
 class And(Sentence):
+
+    # And is never interned, since `add` changes it in place
     def __init__(self, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
         self.conjuncts = list(conjuncts)
+        self._freeze(*conjuncts)
+        self._mutable = True
 
     def __eq__(self, other):
         return isinstance(other, And) and self.conjuncts == other.conjuncts
 
     def __hash__(self):
-        return hash(
+        return self._memo("_hash", lambda: hash(
             ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
+        ))
 
     def __repr__(self):
         conjunctions = ", ".join(
@@ -116,6 +198,10 @@ class And(Sentence):
     def add(self, conjunct):
         Sentence.validate(conjunct)
         self.conjuncts.append(conjunct)
+        self._hash = None
+        self._symbols = None
+        if conjunct._mutable:
+            self._cacheable = False
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
@@ -127,22 +213,38 @@ class And(Sentence):
                            for conjunct in self.conjuncts])
 
     def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+        return set(self._symbol_set())
+
+    def _symbol_set(self):
+        return self._memo("_symbols", lambda: frozenset().union(
+            *[conjunct._symbol_set() for conjunct in self.conjuncts]
+        ))
 
 
 class Or(Sentence):
+    def __new__(cls, *disjuncts):
+        return Sentence.intern(
+            (cls,) + tuple(id(disjunct) for disjunct in disjuncts)
+        )
+
     def __init__(self, *disjuncts):
+        if self._built():
+            return
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
         self.disjuncts = list(disjuncts)
+        self._freeze(*disjuncts)
+
+    def __reduce__(self):
+        return (type(self), tuple(self.disjuncts))
 
     def __eq__(self, other):
         return isinstance(other, Or) and self.disjuncts == other.disjuncts
 
     def __hash__(self):
-        return hash(
+        return self._memo("_hash", lambda: hash(
             ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
+        ))
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
@@ -158,15 +260,29 @@ class Or(Sentence):
                             for disjunct in self.disjuncts])
 
     def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+        return set(self._symbol_set())
+
+    def _symbol_set(self):
+        return self._memo("_symbols", lambda: frozenset().union(
+            *[disjunct._symbol_set() for disjunct in self.disjuncts]
+        ))
 
 
 class Implication(Sentence):
+    def __new__(cls, antecedent, consequent):
+        return Sentence.intern((cls, id(antecedent), id(consequent)))
+
     def __init__(self, antecedent, consequent):
+        if self._built():
+            return
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
         self.antecedent = antecedent
         self.consequent = consequent
+        self._freeze(antecedent, consequent)
+
+    def __reduce__(self):
+        return (type(self), (self.antecedent, self.consequent))
 
     def __eq__(self, other):
         return (isinstance(other, Implication)
@@ -174,7 +290,9 @@ class Implication(Sentence):
                 and self.consequent == other.consequent)
 
     def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+        return self._memo("_hash", lambda: hash(
+            ("implies", hash(self.antecedent), hash(self.consequent))
+        ))
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
@@ -189,15 +307,29 @@ class Implication(Sentence):
         return f"{antecedent} => {consequent}"
 
     def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+        return set(self._symbol_set())
+
+    def _symbol_set(self):
+        return self._memo("_symbols", lambda: (
+            self.antecedent._symbol_set() | self.consequent._symbol_set()
+        ))
 
 
 class Biconditional(Sentence):
+    def __new__(cls, left, right):
+        return Sentence.intern((cls, id(left), id(right)))
+
     def __init__(self, left, right):
+        if self._built():
+            return
         Sentence.validate(left)
         Sentence.validate(right)
         self.left = left
         self.right = right
+        self._freeze(left, right)
+
+    def __reduce__(self):
+        return (type(self), (self.left, self.right))
 
     def __eq__(self, other):
         return (isinstance(other, Biconditional)
@@ -205,7 +337,9 @@ class Biconditional(Sentence):
                 and self.right == other.right)
 
     def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+        return self._memo("_hash", lambda: hash(
+            ("biconditional", hash(self.left), hash(self.right))
+        ))
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
@@ -222,42 +356,155 @@ class Biconditional(Sentence):
         return f"{left} <=> {right}"
 
     def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
-
-
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
-
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
-
-        # If model has an assignment for each symbol
-        if not symbols:
-
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
-            return True
-        else:
-
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
-
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
-
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
-
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
+        return set(self._symbol_set())
+
+    def _symbol_set(self):
+        return self._memo("_symbols", lambda: (
+            self.left._symbol_set() | self.right._symbol_set()
+        ))
+
+
+def model_check(knowledge, query, backend="enumerate", workers=1):
+    """Checks if knowledge base entails query.
+
+    The "enumerate" backend tries every model of the symbols, and the
+    "compiled" and "numpy" backends do the same with the sentences
+    compiled by compiled.py, one model or a batch of bit-packed models
+    at a time. The "sat" backend hands the problem to the CDCL solver in
+    sat.py instead, which scales to knowledge bases with hundreds of
+    symbols.
+
+    With the "enumerate" backend, `workers` above 1 splits the models on
+    their values of the first few symbols and checks the parts across a
+    process pool, stopping every worker as soon as one of them finds a
+    model where knowledge is true and query is false.
+    """
+
+    # These modules import this one, so import them only when needed
+    if backend == "sat":
+        from sat import entails
+        return entails(knowledge, query)
+    elif backend == "compiled":
+        from compiled import model_check_compiled
+        return model_check_compiled(knowledge, query)
+    elif backend == "numpy":
+        from compiled import model_check_batch
+        return model_check_batch(knowledge, query)
+    elif backend != "enumerate":
+        raise ValueError(f"unknown backend {backend!r}")
 
     # Get all symbols in both knowledge and query
     symbols = set.union(knowledge.symbols(), query.symbols())
 
     # Check that knowledge entails query
+    if workers > 1 and symbols:
+        return check_parallel(knowledge, query, symbols, workers)
     return check_all(knowledge, query, symbols, dict())
+
+
+def check_all(knowledge, query, symbols, model):
+    """Checks if knowledge base entails query, given a particular model."""
+
+    # If model has an assignment for each symbol
+    if not symbols:
+
+        # If knowledge base is true in model, then query must also be true
+        if knowledge.evaluate(model):
+            return query.evaluate(model)
+        return True
+    else:
+
+        # Choose one of the remaining unused symbols
+        remaining = symbols.copy()
+        p = remaining.pop()
+
+        # Create a model where the symbol is true
+        model_true = model.copy()
+        model_true[p] = True
+
+        # Create a model where the symbol is false
+        model_false = model.copy()
+        model_false[p] = False
+
+        # Ensure entailment holds in both models
+        return (check_all(knowledge, query, remaining, model_true) and
+                check_all(knowledge, query, remaining, model_false))
+
+
+def check_parallel(knowledge, query, symbols, workers):
+    """Checks if knowledge base entails query across a process pool.
+
+    Each task fixes the first k symbols to one of their 2 ** k
+    assignments and checks every model of the rest, with k chosen to
+    give each worker several tasks so that they finish together.
+    """
+    symbols = sorted(symbols)
+    k = min(len(symbols), (workers * 4 - 1).bit_length())
+    fixed, rest = symbols[:k], set(symbols[k:])
+    prefixes = [dict(zip(fixed, values))
+                for values in itertools.product((True, False), repeat=k)]
+
+    # Leaving the pool terminates it, cancelling any tasks still running
+    with multiprocessing.Pool(workers, _init_worker,
+                              (knowledge, query, rest)) as pool:
+        for entailed in pool.imap_unordered(_check_prefix, prefixes):
+            if not entailed:
+                return False
+    return True
+
+
+# Knowledge base, query and unfixed symbols of a worker's tasks
+_task = None
+
+
+def _init_worker(knowledge, query, symbols):
+    """Stores the problem shared by every task in a worker process."""
+    global _task
+    _task = (knowledge, query, symbols)
+
+
+def _check_prefix(model):
+    """Checks every model of a worker's problem extending model."""
+    knowledge, query, symbols = _task
+    return check_all(knowledge, query, symbols, model)
+
+
+def model_check_all(knowledge, queries, backend="enumerate"):
+    """Checks which of several queries knowledge base entails.
+
+    Returns a list holding, for each query, whether it is entailed. The
+    models of the knowledge base are enumerated (or, with the "sat"
+    backend, the knowledge base is encoded) once for all queries, rather
+    than once per query as with `model_check`.
+    """
+    queries = list(queries)
+
+    # These modules import this one, so import them only when needed
+    if backend == "sat":
+        from sat import entails_all
+        return entails_all(knowledge, queries)
+    elif backend == "compiled":
+        from compiled import model_check_all_compiled
+        return model_check_all_compiled(knowledge, queries)
+    elif backend == "numpy":
+        from compiled import model_check_all_batch
+        return model_check_all_batch(knowledge, queries)
+    elif backend != "enumerate":
+        raise ValueError(f"unknown backend {backend!r}")
+
+    # Get all symbols in knowledge and every query
+    symbols = list(set.union(knowledge.symbols(),
+                             *[query.symbols() for query in queries]))
+
+    # A query stays entailed until a model of knowledge makes it false
+    entailed = [True] * len(queries)
+    for values in itertools.product((True, False), repeat=len(symbols)):
+        model = dict(zip(symbols, values))
+        if not knowledge.evaluate(model):
+            continue
+        for i, query in enumerate(queries):
+            if entailed[i] and not query.evaluate(model):
+                entailed[i] = False
+        if not any(entailed):
+            break
+    return entailed
@@ -0,0 +1,469 @@
+"""
+SAT-based entailment for logic.py
+
+`model_check` in logic.py enumerates all 2 ** n models, which is only
+feasible for a few dozen symbols. Here the knowledge base and the
+negated query are instead converted to conjunctive normal form (CNF) and
+handed to a CDCL solver: the knowledge base entails the query exactly
+when no model satisfies both.
+
+Literals are nonzero ints: variable v is the literal v, and its negation
+is -v. A clause is a list of literals, at least one of which must hold.
+"""
+import heapq
+
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+
+
+class CNF():
+
+    def __init__(self):
+        """
+        Initialize an empty formula.
+        Each formula has
+            - `variables`: a dict from symbol names to their variables
+            - `count`: the number of variables, including ones that
+              stand for compound sentences
+            - `clauses`: a list of clauses that must all hold
+        """
+        self.variables = dict()
+        self.count = 0
+        self.clauses = []
+
+        # Literal of each compound sentence encoded so far, so that
+        # repeated sub-sentences share one variable
+        self.literals = dict()
+
+    def new_variable(self):
+        """
+        Returns a fresh variable.
+        """
+        self.count += 1
+        return self.count
+
+    def variable(self, name):
+        """
+        Returns the variable of the symbol called `name`.
+        """
+        if name not in self.variables:
+            self.variables[name] = self.new_variable()
+        return self.variables[name]
+
+    def add(self, sentence):
+        """
+        Adds clauses requiring `sentence` to be true.
+
+        Conjunctions and disjunctions at the top are added directly;
+        anything deeper is encoded with `literal`.
+        """
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        elif isinstance(sentence, Or):
+            self.clauses.append(
+                [self.literal(disjunct) for disjunct in sentence.disjuncts]
+            )
+        elif isinstance(sentence, Implication):
+            self.clauses.append([-self.literal(sentence.antecedent),
+                                 self.literal(sentence.consequent)])
+        else:
+            self.clauses.append([self.literal(sentence)])
+
+    def literal(self, sentence):
+        """
+        Returns a literal that is true exactly when `sentence` is true.
+
+        Compound sentences get a new variable, tied to the literals of
+        their parts by clauses (the Tseitin encoding), so the CNF grows
+        linearly with the size of the sentence.
+        """
+        if isinstance(sentence, Symbol):
+            return self.variable(sentence.name)
+        if isinstance(sentence, Not):
+            return -self.literal(sentence.operand)
+        if sentence in self.literals:
+            return self.literals[sentence]
+
+        v = self.new_variable()
+        if isinstance(sentence, And):
+            parts = [self.literal(part) for part in sentence.conjuncts]
+            for part in parts:
+                self.clauses.append([-v, part])
+            self.clauses.append([v] + [-part for part in parts])
+        elif isinstance(sentence, Or):
+            parts = [self.literal(part) for part in sentence.disjuncts]
+            for part in parts:
+                self.clauses.append([v, -part])
+            self.clauses.append([-v] + parts)
+        elif isinstance(sentence, Implication):
+            a = self.literal(sentence.antecedent)
+            b = self.literal(sentence.consequent)
+            self.clauses.extend([[-v, -a, b], [v, a], [v, -b]])
+        elif isinstance(sentence, Biconditional):
+            a = self.literal(sentence.left)
+            b = self.literal(sentence.right)
+            self.clauses.extend([[-v, -a, b], [-v, a, -b],
+                                 [v, a, b], [v, -a, -b]])
+        else:
+            raise TypeError(f"cannot encode {sentence!r}")
+        self.literals[sentence] = v
+        return v
+
+
+class Solver():
+
+    def __init__(self, clauses=(), count=0):
+        """
+        Initialize a solver for the clauses `clauses` over variables
+        1 to `count` (more are added as clauses mention them).
+        """
+        # Clauses of two or more literals; the first two are watched
+        self.clauses = []
+
+        # watches[lit] lists the clauses watching `lit`, visited when
+        # `lit` becomes false
+        self.watches = dict()
+
+        # Value of every assigned literal and of its negation
+        self.truth = dict()
+
+        # Per-variable state, indexed by variable (index 0 is unused)
+        self.levels = [0]
+        self.reasons = [None]
+        self.activity = [0.0]
+        self.phases = [False]
+
+        # Assigned literals in order, and where each decision level starts
+        self.trail = []
+        self.limits = []
+        self.head = 0
+
+        # Variables ordered by activity; entries may be stale
+        self.order = []
+        self.increment = 1.0
+
+        # False once the clauses are known to be unsatisfiable
+        self.ok = True
+
+        # Counters from the most recent call to solve
+        self.stats = {"decisions": 0, "conflicts": 0, "propagations": 0}
+
+        self.reserve(count)
+        for clause in clauses:
+            self.add_clause(clause)
+
+    def reserve(self, count):
+        """
+        Makes room for variables 1 to `count`.
+        """
+        for v in range(len(self.levels), count + 1):
+            self.levels.append(0)
+            self.reasons.append(None)
+            self.activity.append(0.0)
+            self.phases.append(False)
+            self.watches[v] = []
+            self.watches[-v] = []
+            heapq.heappush(self.order, (0.0, v))
+
+    def value(self, lit):
+        """
+        Returns True or False if `lit` is assigned, otherwise None.
+        """
+        return self.truth.get(lit)
+
+    def add_clause(self, clause):
+        """
+        Adds a clause that must hold in every model. Returns False if the
+        clauses are now known to be unsatisfiable.
+        """
+        if not self.ok:
+            return False
+        self.reserve(max((abs(lit) for lit in clause), default=0))
+
+        # Clauses are only added at the top level, so assigned literals
+        # are permanent: drop false ones, and satisfied clauses entirely
+        self.backtrack(0)
+        lits = []
+        for lit in clause:
+            value = self.value(lit)
+            if value is True or -lit in lits:
+                return True
+            if value is None and lit not in lits:
+                lits.append(lit)
+
+        if not lits:
+            self.ok = False
+        elif len(lits) == 1:
+            self.assign(lits[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.attach(lits)
+        return self.ok
+
+    def attach(self, lits):
+        """
+        Stores a clause of two or more literals, watching the first two,
+        and returns its index.
+        """
+        self.clauses.append(lits)
+        index = len(self.clauses) - 1
+        self.watches[lits[0]].append(index)
+        self.watches[lits[1]].append(index)
+        return index
+
+    def assign(self, lit, reason):
+        """
+        Makes `lit` true at the current level, implied by the clause
+        `reason` (None for decisions and top-level facts).
+        """
+        v = abs(lit)
+        self.truth[lit] = True
+        self.truth[-lit] = False
+        self.levels[v] = len(self.limits)
+        self.reasons[v] = reason
+        self.trail.append(lit)
+
+    def propagate(self):
+        """
+        Assigns every literal implied by unit clauses and returns the
+        index of a clause with all literals false, or None.
+
+        Only clauses watching a literal that just became false are
+        visited; each either finds another literal to watch, is already
+        satisfied, or has become unit or conflicting.
+        """
+        clauses = self.clauses
+        truth = self.truth
+        while self.head < len(self.trail):
+            false_lit = -self.trail[self.head]
+            self.head += 1
+            self.stats["propagations"] += 1
+
+            watchers = self.watches[false_lit]
+            kept = []
+            for position, index in enumerate(watchers):
+                clause = clauses[index]
+
+                # Keep the false literal second
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], false_lit
+                first = truth.get(clause[0])
+                if first is True:
+                    kept.append(index)
+                    continue
+
+                # Watch any other literal that is not false
+                for k in range(2, len(clause)):
+                    if truth.get(clause[k]) is not False:
+                        clause[1], clause[k] = clause[k], false_lit
+                        self.watches[clause[1]].append(index)
+                        break
+                else:
+                    kept.append(index)
+                    if first is False:
+                        kept.extend(watchers[position + 1:])
+                        self.watches[false_lit] = kept
+                        return index
+                    self.assign(clause[0], index)
+            self.watches[false_lit] = kept
+        return None
+
+    def analyze(self, conflict):
+        """
+        Returns `(clause, level)`: a clause learned from the conflicting
+        clause `conflict`, with the literal to assert first, and the
+        level to backjump to.
+
+        Resolves the conflict with the reasons of literals assigned at
+        the current level, most recent first, until only one of them
+        remains (the first unique implication point).
+        """
+        level = len(self.limits)
+        learned = [None]
+        seen = set()
+        pending = 0
+        lit = None
+        index = len(self.trail) - 1
+        clause = self.clauses[conflict]
+        while True:
+            for q in clause if lit is None else clause[1:]:
+                v = abs(q)
+                if v not in seen and self.levels[v] > 0:
+                    seen.add(v)
+                    self.bump(v)
+                    if self.levels[v] == level:
+                        pending += 1
+                    else:
+                        learned.append(q)
+
+            # Resolve on the latest assigned literal of the clause
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            lit = self.trail[index]
+            index -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.clauses[self.reasons[abs(lit)]]
+        learned[0] = -lit
+
+        # Watch the literal that becomes false last when backjumping
+        backjump = 0
+        for k in range(1, len(learned)):
+            if self.levels[abs(learned[k])] > backjump:
+                backjump = self.levels[abs(learned[k])]
+                learned[1], learned[k] = learned[k], learned[1]
+        return learned, backjump
+
+    def bump(self, v):
+        """
+        Raises the activity of variable `v`, so that variables involved in
+        recent conflicts are decided first.
+        """
+        self.activity[v] += self.increment
+        if self.activity[v] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.increment *= 1e-100
+            self.order = [(-self.activity[u], u)
+                          for u in range(1, len(self.levels))]
+            heapq.heapify(self.order)
+        else:
+            heapq.heappush(self.order, (-self.activity[v], v))
+
+    def backtrack(self, level):
+        """
+        Undoes all assignments above decision level `level`.
+        """
+        if len(self.limits) <= level:
+            return
+        start = self.limits[level]
+        for lit in self.trail[start:]:
+            v = abs(lit)
+            self.phases[v] = lit > 0
+            del self.truth[lit], self.truth[-lit]
+            self.reasons[v] = None
+            heapq.heappush(self.order, (-self.activity[v], v))
+        del self.trail[start:]
+        del self.limits[level:]
+        self.head = start
+
+    def decide(self):
+        """
+        Returns the unassigned variable with the highest activity, or
+        None if every variable is assigned.
+        """
+        while self.order:
+            activity, v = heapq.heappop(self.order)
+            if v not in self.truth and -activity == self.activity[v]:
+                return v
+        return None
+
+    def solve(self, assumptions=()):
+        """
+        Returns True if the clauses have a model in which every literal
+        in `assumptions` is true, and False otherwise. After a True
+        result, `model` maps each variable to its value.
+
+        Clauses learned under assumptions follow from the clauses alone,
+        so they are kept for later calls.
+        """
+        self.stats = {"decisions": 0, "conflicts": 0, "propagations": 0}
+        self.model = None
+        if not self.ok:
+            return False
+        self.reserve(max((abs(lit) for lit in assumptions), default=0))
+        self.backtrack(0)
+
+        restart = 100
+        conflicts = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.stats["conflicts"] += 1
+                conflicts += 1
+                if not self.limits:
+                    self.ok = False
+                    return False
+                learned, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learned) == 1:
+                    self.assign(learned[0], None)
+                else:
+                    self.assign(learned[0], self.attach(learned))
+                self.increment /= 0.95
+                continue
+
+            if conflicts >= restart:
+                conflicts = 0
+                restart = int(restart * 1.5)
+                self.backtrack(0)
+                continue
+
+            # Decide the assumptions first, one level each
+            level = len(self.limits)
+            if level < len(assumptions):
+                lit = assumptions[level]
+                value = self.value(lit)
+                if value is False:
+                    self.backtrack(0)
+                    return False
+                self.limits.append(len(self.trail))
+                if value is None:
+                    self.assign(lit, None)
+                continue
+
+            v = self.decide()
+            if v is None:
+                self.model = {u: self.truth[u]
+                              for u in range(1, len(self.levels))}
+                self.backtrack(0)
+                return True
+            self.stats["decisions"] += 1
+            self.limits.append(len(self.trail))
+            self.assign(v if self.phases[v] else -v, None)
+
+
+def satisfiable(sentence):
+    """
+    Returns a model of `sentence`, as a dict from symbol names to
+    values, or None if it has none.
+    """
+    cnf = CNF()
+    cnf.add(sentence)
+    solver = Solver(cnf.clauses, cnf.count)
+    if not solver.solve():
+        return None
+    return {name: solver.model[v] for name, v in cnf.variables.items()}
+
+
+def entails(knowledge, query):
+    """
+    Returns True if `knowledge` entails `query`, that is, if no model
+    makes `knowledge` true and `query` false.
+    """
+    cnf = CNF()
+    cnf.add(knowledge)
+    cnf.add(Not(query))
+    return not Solver(cnf.clauses, cnf.count).solve()
+
+
+def entails_all(knowledge, queries):
+    """
+    Returns a list holding, for each query in `queries`, whether
+    `knowledge` entails it.
+
+    The knowledge base is encoded into one solver, and each query is
+    checked by solving under the assumption that it is false, so clauses
+    learned for one query speed up the rest.
+    """
+    cnf = CNF()
+    cnf.add(knowledge)
+    solver = Solver(cnf.clauses, cnf.count)
+    entailed = []
+    for query in queries:
+        start = len(cnf.clauses)
+        lit = cnf.literal(query)
+        for clause in cnf.clauses[start:]:
+            solver.add_clause(clause)
+        entailed.append(not solver.solve([-lit]))
+    return entailed
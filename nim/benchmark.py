@@ -0,0 +1,88 @@
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+from nim import Nim, NimAI, SparseNimAI, train
+
+
+def measure(make_ai, piles, games):
+    """
+    Train the AI returned by `make_ai()` for `games` games from `piles`
+    and return its training time, stored Q-values and the memory the
+    AI holds afterwards.
+    """
+    tracemalloc.start()
+    ai = make_ai()
+    start = time.perf_counter()
+    train(games, ai, report_every=0, initial=piles)
+    elapsed = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    entries = ai.entries if isinstance(ai, SparseNimAI) else len(ai.q)
+    return {"seconds": elapsed, "entries": entries, "bytes": memory}
+
+
+def action_set_bytes(piles):
+    """
+    Return the memory taken by `Nim.available_actions` for `piles`.
+    """
+    tracemalloc.start()
+    actions = Nim.available_actions(piles)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del actions
+    return memory
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare Nim Q-store memory as piles grow."
+    )
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[7, 25, 50, 100, 200],
+                        help="size of each of the four piles to try")
+    parser.add_argument("--games", type=int, default=500,
+                        help="training games per configuration")
+    parser.add_argument("--cap", type=int, default=10000,
+                        help="max_entries for the capped SparseNimAI")
+    parser.add_argument("--output", help="write the results as JSON here")
+    args = parser.parse_args()
+
+    ais = [
+        ("NimAI", lambda piles: NimAI()),
+        ("SparseNimAI", SparseNimAI),
+        (f"SparseNimAI(max_entries={args.cap})",
+         lambda piles: SparseNimAI(piles, max_entries=args.cap))
+    ]
+
+    results = []
+    for size in args.sizes:
+        piles = [size] * 4
+        row = {"piles": piles,
+               "action_set_bytes": action_set_bytes(piles)}
+        for name, make_ai in ais:
+            row[name] = measure(lambda: make_ai(piles), piles, args.games)
+        results.append(row)
+
+        # Compare memory per stored Q-value with the dict-based NimAI
+        baseline = row["NimAI"]["bytes"] / max(1, row["NimAI"]["entries"])
+        print(f"Piles {piles}: action set "
+              f"{row['action_set_bytes'] / 1024:.1f} KiB")
+        for name, _ in ais:
+            stats = row[name]
+            each = stats["bytes"] / max(1, stats["entries"])
+            print(f"    {name}: {stats['entries']} entries, "
+                  f"{stats['bytes'] / 1024:.1f} KiB "
+                  f"({each:.0f} B each, {each / baseline:.0%} of NimAI), "
+                  f"{stats['seconds']:.2f}s")
+        sys.stdout.flush()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,18 @@
+import itertools
+import json
+import math
+import multiprocessing
 import random
+import struct
 import time
 
+from array import array
+
+import numpy as np
+
+# Marks a free slot or the end of a chain in the tables of a SparseNimAI
+EMPTY_KEY = -1
+
 
 class Nim():
 
@@ -31,6 +43,25 @@ class Nim():
                 actions.add((i, j))
         return actions
 
+    @classmethod
+    def iter_actions(cls, piles):
+        """
+        Nim.iter_actions(piles) yields the same actions as
+        `available_actions`, one at a time, without building a set.
+        """
+        for i, pile in enumerate(piles):
+            for j in range(1, pile + 1):
+                yield (i, j)
+
+    @classmethod
+    def is_available(cls, piles, action):
+        """
+        Nim.is_available(piles, action) returns True if `action` is
+        one of the available actions in `piles`.
+        """
+        i, j = action
+        return 0 <= i < len(piles) and 1 <= j <= piles[i]
+
     @classmethod
     def other_player(cls, player):
         """
@@ -85,6 +116,9 @@ class NimAI():
         self.alpha = alpha
         self.epsilon = epsilon
 
+        # Number of training games played so far
+        self.games = 0
+
     def update(self, old_state, action, new_state, reward):
         """
         Update Q-learning model, given an old state, an action taken
@@ -178,68 +212,1040 @@ class NimAI():
                 return k
 
 
-def train(n):
+class DenseNimAI():
+
+    def __init__(self, initial=[1, 3, 5, 7], alpha=0.5, epsilon=0.1):
+        """
+        Initialize AI with a dense Q-table for games starting from the
+        piles `initial`, an alpha (learning) rate, and an epsilon rate.
+
+        States are numbered with a mixed-radix encoding where pile `i`
+        is a digit of base `initial[i] + 1`, and action `(i, j)` is
+        column `offsets[i] + j - 1`. `self.q[state, action]` is the
+        Q-value, and `self.valid[state, action]` says whether the action
+        is available in the state, so lookups are array indexing and
+        maximizing over actions is a single vectorized call.
+        """
+        self.initial = list(initial)
+        self.alpha = alpha
+        self.epsilon = epsilon
+
+        # Number of training games played so far
+        self.games = 0
+
+        self.radix = []
+        size = 1
+        for pile in self.initial:
+            self.radix.append(size)
+            size *= pile + 1
+
+        self.offsets = []
+        self.actions = []
+        for i, pile in enumerate(self.initial):
+            self.offsets.append(len(self.actions))
+            self.actions.extend((i, j) for j in range(1, pile + 1))
+
+        # Pile sizes of every state, one row per state index
+        piles = np.zeros((size, len(self.initial)), dtype=np.int64)
+        for i, pile in enumerate(self.initial):
+            piles[:, i] = np.arange(size) // self.radix[i] % (pile + 1)
+        pile_of = np.array([i for i, _ in self.actions], dtype=np.int64)
+        count_of = np.array([j for _, j in self.actions], dtype=np.int64)
+        self.valid = piles[:, pile_of] >= count_of
+
+        # State reached by each valid action; invalid entries stay put
+        radix = np.array(self.radix, dtype=np.int64)[pile_of]
+        states = np.arange(size)[:, None]
+        self.next_state = np.where(self.valid, states - count_of * radix,
+                                   states)
+
+        self.q = np.zeros((size, len(self.actions)))
+
+    def state_index(self, state):
+        """
+        Return the row of `self.q` for the piles `state`.
+        """
+        return sum(pile * radix for pile, radix in zip(state, self.radix))
+
+    def action_index(self, action):
+        """
+        Return the column of `self.q` for the action `(i, j)`.
+        """
+        return self.offsets[action[0]] + action[1] - 1
+
+    def update(self, old_state, action, new_state, reward):
+        """
+        Update Q-learning model, given an old state, an action taken
+        in that state, a new resulting state, and the reward received
+        from taking that action.
+        """
+        old = self.get_q_value(old_state, action)
+        best_future = self.best_future_reward(new_state)
+        self.update_q_value(old_state, action, old, reward, best_future)
+
+    def update_batch(self, old_states, actions, new_states, rewards):
+        """
+        Apply the Q-learning update for a batch of transitions at once.
+
+        Arguments are equal-length sequences of state indices, action
+        indices, resulting state indices and rewards. All updates use
+        the Q-values from before the batch, and a (state, action) pair
+        that appears several times moves by the mean of its updates.
+        """
+        old_states = np.asarray(old_states)
+        actions = np.asarray(actions)
+        new_states = np.asarray(new_states)
+        future = np.where(self.valid[new_states], self.q[new_states], -np.inf)
+        future = future.max(axis=1)
+        future[np.isneginf(future)] = 0
+        target = np.asarray(rewards) + future
+        delta = self.alpha * (target - self.q[old_states, actions])
+
+        cells = old_states * self.q.shape[1] + actions
+        cells, inverse, counts = np.unique(cells, return_inverse=True,
+                                           return_counts=True)
+        self.q.flat[cells] += np.bincount(inverse, weights=delta) / counts
+
+    def self_play(self, n, batch_size=256):
+        """
+        Train by playing `n` games against itself, `batch_size` games at
+        a time in lockstep.
+
+        Each step picks epsilon-greedy moves for every running game with
+        one vectorized argmax, applies the moves through
+        `self.next_state`, and feeds the resulting transitions to
+        `update_batch` with the same rewards as `train`. Finished games
+        are replaced by new ones until `n` games have been played.
+        """
+        self.games += n
+        start = self.state_index(self.initial)
+        batch = min(batch_size, n)
+        started = batch
+        games = np.arange(batch)
+        state = np.full(batch, start)
+        # Last (state, action) of each player in each game; -1 for none
+        last_state = np.full((2, batch), -1)
+        last_action = np.full((2, batch), -1)
+        turn = np.zeros(batch, dtype=np.int64)
+        running = np.ones(batch, dtype=bool)
+
+        while running.any():
+            live = games[running]
+            current = state[live]
+            valid = self.valid[current]
+
+            # Epsilon-greedy: random scores for exploring games,
+            # Q-values for the rest, then one argmax per row
+            explore = np.random.random(len(live)) < self.epsilon
+            scores = np.where(explore[:, None],
+                              np.random.random(valid.shape), self.q[current])
+            action = np.where(valid, scores, -np.inf).argmax(axis=1)
+            new = self.next_state[current, action]
+
+            mover = turn[live]
+            other = 1 - mover
+            last_state[mover, live] = current
+            last_action[mover, live] = action
+            over = new == 0
+            waiting = last_state[other, live] >= 0
+
+            # Loser's final move, winner's last move, and the opponent's
+            # previous move in games that continue
+            old_states = np.concatenate([
+                current[over],
+                last_state[other, live][over & waiting],
+                last_state[other, live][~over & waiting]
+            ])
+            actions = np.concatenate([
+                action[over],
+                last_action[other, live][over & waiting],
+                last_action[other, live][~over & waiting]
+            ])
+            new_states = np.concatenate([
+                new[over], new[over & waiting], new[~over & waiting]
+            ])
+            rewards = np.concatenate([
+                np.full(over.sum(), -1.0),
+                np.full((over & waiting).sum(), 1.0),
+                np.zeros((~over & waiting).sum())
+            ])
+            if len(old_states):
+                self.update_batch(old_states, actions, new_states, rewards)
+
+            state[live] = new
+            turn[live] = other
+
+            # Start new games in place of finished ones
+            for game in live[over]:
+                if started < n:
+                    started += 1
+                    state[game] = start
+                    last_state[:, game] = -1
+                    last_action[:, game] = -1
+                    turn[game] = 0
+                else:
+                    running[game] = False
+
+    def get_q_value(self, state, action):
+        """
+        Return the Q-value for the state `state` and the action `action`.
+        """
+        return self.q[self.state_index(state), self.action_index(action)]
+
+    def update_q_value(self, state, action, old_q, reward, future_rewards):
+        """
+        Update the Q-value for the state `state` and the action `action`
+        given the previous Q-value `old_q`, a current reward `reward`,
+        and an estimate of future rewards `future_rewards`.
+        """
+        self.q[self.state_index(state), self.action_index(action)] = (
+            old_q + self.alpha * ((reward + future_rewards) - old_q)
+        )
+
+    def best_future_reward(self, state):
+        """
+        Given a state `state`, return the maximum Q-value of the
+        actions available in it, or 0 if there are none.
+        """
+        row = self.state_index(state)
+        valid = self.valid[row]
+        if not valid.any():
+            return 0
+        return self.q[row, valid].max()
+
+    def choose_action(self, state, epsilon=True):
+        """
+        Given a state `state`, return an action `(i, j)` to take.
+
+        If `epsilon` is `False`, then return the best action
+        available in the state. If `epsilon` is `True`, then with
+        probability `self.epsilon` choose a random available action,
+        otherwise choose the best action available.
+        """
+        row = self.state_index(state)
+        if epsilon and random.random() < self.epsilon:
+            choices = np.flatnonzero(self.valid[row])
+            return self.actions[random.choice(choices)]
+        values = np.where(self.valid[row], self.q[row], -np.inf)
+        return self.actions[int(values.argmax())]
+
+
+class SparseNimAI():
+
+    def __init__(self, initial=[1, 3, 5, 7], alpha=0.5, epsilon=0.1,
+                 max_entries=None):
+        """
+        Initialize AI with an empty sparse Q-store for games starting
+        from the piles `initial`, an alpha (learning) rate, an epsilon
+        rate, and an optional cap on the number of stored Q-values.
+
+        Every state with a stored Q-value gets a number: its piles are
+        row `number` of the flat array `self.piles`, found through the
+        open-addressed hash table `self.state_slots`, keyed by the hash
+        of the pile tuple. Q-values live in a second open-addressed
+        table of parallel arrays, keyed by the hash of the state number
+        and the packed action `j * len(initial) + i`: `self.pair_states`
+        (EMPTY_KEY for free slots), `self.pair_actions` and
+        `self.values`. `self.links` chains the pairs of each state from
+        `self.heads[number]`, so the stored actions of a state are found
+        without enumerating its available actions. Unstored pairs have
+        Q-value 0.
+
+        When more than `max_entries` Q-values are stored, the least
+        recently updated ones are evicted, along with states left
+        without any; `self.stamps` records when each pair was last
+        updated and only exists with a cap.
+        """
+        self.initial = list(initial)
+        self.alpha = alpha
+        self.epsilon = epsilon
+        self.max_entries = max_entries
+        self.entries = 0
+
+        # Number of training games played so far
+        self.games = 0
+
+        self.width = len(self.initial)
+        self.piles = array("q")
+        self.heads = array("i")
+        self.state_slots = array("i", [EMPTY_KEY]) * 8
+        self.updates = 0
+        self.allocate(8)
+
+    def allocate(self, capacity):
+        """
+        Replace the table of Q-values with an empty one of `capacity`
+        slots, a power of two, unlinking every state.
+        """
+        self.pair_states = array("i", [EMPTY_KEY]) * capacity
+        self.pair_actions = array("q", [0]) * capacity
+        self.values = array("d", [0.0]) * capacity
+        self.links = array("i", [EMPTY_KEY]) * capacity
+        if self.max_entries is not None:
+            self.stamps = array("q", [0]) * capacity
+        self.heads = array("i", [EMPTY_KEY]) * len(self.heads)
+
+    @classmethod
+    def spread(cls, value, capacity):
+        """
+        Return the slot for the hash `value` in a table of `capacity`
+        slots, a power of two.
+        """
+        # Fibonacci hashing spreads hashes that differ only in low bits
+        return ((value * 0x9E3779B97F4A7C15 & 0xFFFFFFFFFFFFFFFF)
+                >> (65 - capacity.bit_length()))
+
+    def action_code(self, action):
+        """
+        Return the packed action for the action `(i, j)`.
+        """
+        return action[1] * self.width + action[0]
+
+    def action(self, code):
+        """
+        Return the action `(i, j)` for the packed action `code`.
+        """
+        return (code % self.width, code // self.width)
+
+    def state_slot(self, row):
+        """
+        Return the slot of `self.state_slots` holding the state with the
+        piles `row`, an array, or the free slot where it would go.
+        """
+        slots = self.state_slots
+        mask = len(slots) - 1
+        width = self.width
+        position = self.spread(hash(tuple(row)), len(slots))
+        while slots[position] != EMPTY_KEY:
+            base = slots[position] * width
+            if self.piles[base:base + width] == row:
+                break
+            position = (position + 1) & mask
+        return position
+
+    def state_number(self, state):
+        """
+        Return the number of the piles `state`, or EMPTY_KEY if no
+        Q-value is stored for it.
+        """
+        return self.state_slots[self.state_slot(array("q", state))]
+
+    def pair_slot(self, number, code):
+        """
+        Return the slot holding the Q-value of the packed action `code`
+        in state number `number`, or the free slot where it would go.
+        """
+        states = self.pair_states
+        actions = self.pair_actions
+        mask = len(states) - 1
+        position = self.spread(hash((number, code)), len(states))
+        while states[position] != EMPTY_KEY and (
+                states[position] != number or actions[position] != code):
+            position = (position + 1) & mask
+        return position
+
+    def stored(self, state):
+        """
+        Return a list of `(value, packed action)` for the stored actions
+        of the piles `state`.
+        """
+        number = self.state_number(state)
+        if number == EMPTY_KEY:
+            return []
+        found = []
+        position = self.heads[number]
+        while position != EMPTY_KEY:
+            found.append((self.values[position], self.pair_actions[position]))
+            position = self.links[position]
+        return found
+
+    def update(self, old_state, action, new_state, reward):
+        """
+        Update Q-learning model, given an old state, an action taken
+        in that state, a new resulting state, and the reward received
+        from taking that action.
+        """
+        old = self.get_q_value(old_state, action)
+        best_future = self.best_future_reward(new_state)
+        self.update_q_value(old_state, action, old, reward, best_future)
+
+    def get_q_value(self, state, action):
+        """
+        Return the Q-value for the state `state` and the action `action`.
+        If no Q-value is stored, return 0.
+        """
+        number = self.state_number(state)
+        if number == EMPTY_KEY:
+            return 0
+        return self.values[self.pair_slot(number, self.action_code(action))]
+
+    def update_q_value(self, state, action, old_q, reward, future_rewards):
+        """
+        Update the Q-value for the state `state` and the action `action`
+        given the previous Q-value `old_q`, a current reward `reward`,
+        and an estimate of future rewards `future_rewards`.
+        """
+        self.set_q_value(
+            state, action,
+            old_q + self.alpha * ((reward + future_rewards) - old_q)
+        )
+
+    def set_q_value(self, state, action, value):
+        """
+        Store `value` as the Q-value for the state `state` and the action
+        `action`, evicting old Q-values if the store grows past
+        `max_entries`.
+        """
+        row = array("q", state)
+        slot = self.state_slot(row)
+        number = self.state_slots[slot]
+        if number == EMPTY_KEY:
+            number = len(self.heads)
+            self.piles.extend(row)
+            self.heads.append(EMPTY_KEY)
+            self.state_slots[slot] = number
+            if 3 * len(self.heads) > 2 * len(self.state_slots):
+                self.index_states(2 * len(self.state_slots))
+        self.store(number, self.action_code(action), value)
+
+        if self.max_entries is not None and self.entries > self.max_entries:
+            self.evict(max(1, self.max_entries - self.max_entries // 10))
+
+    def store(self, number, code, value):
+        """
+        Store `value` for the packed action `code` in state number
+        `number`, growing the table to keep it at most two thirds full.
+        """
+        position = self.pair_slot(number, code)
+        if self.pair_states[position] == EMPTY_KEY:
+            if 3 * (self.entries + 1) > 2 * len(self.pair_states):
+                self.move_pairs(2 * len(self.pair_states), self.occupied())
+                position = self.pair_slot(number, code)
+            self.link(position, number, code)
+        self.values[position] = value
+        if self.max_entries is not None:
+            self.updates += 1
+            self.stamps[position] = self.updates
+
+    def link(self, position, number, code):
+        """
+        Claim the free slot `position` for the packed action `code` in
+        state number `number`.
+        """
+        self.pair_states[position] = number
+        self.pair_actions[position] = code
+        self.links[position] = self.heads[number]
+        self.heads[number] = position
+        self.entries += 1
+
+    def occupied(self):
+        """
+        Return the list of slots holding a Q-value.
+        """
+        states = self.pair_states
+        return [position for position in range(len(states))
+                if states[position] != EMPTY_KEY]
+
+    def index_states(self, capacity):
+        """
+        Rebuild `self.state_slots` with `capacity` slots, a power of two.
+        """
+        self.state_slots = array("i", [EMPTY_KEY]) * capacity
+        width = self.width
+        for number in range(len(self.heads)):
+            row = self.piles[number * width:(number + 1) * width]
+            self.state_slots[self.state_slot(row)] = number
+
+    def move_pairs(self, capacity, positions, numbers=None):
+        """
+        Move the Q-values in the slots `positions` into a new table of
+        `capacity` slots, a power of two, renumbering their states by
+        the array `numbers` if given.
+        """
+        states, actions = self.pair_states, self.pair_actions
+        values = self.values
+        stamps = self.stamps if self.max_entries is not None else None
+        self.allocate(capacity)
+        self.entries = 0
+        for position in positions:
+            number = states[position]
+            if numbers is not None:
+                number = numbers[number]
+            new = self.pair_slot(number, actions[position])
+            self.link(new, number, actions[position])
+            self.values[new] = values[position]
+            if stamps is not None:
+                self.stamps[new] = stamps[position]
+
+    def evict(self, keep):
+        """
+        Evict Q-values, least recently updated first, until at most
+        `keep` are stored, and forget states left without any.
+        """
+        # Evicting in one pass keeps the cost per stored value constant
+        positions = self.occupied()
+        positions.sort(key=self.stamps.__getitem__)
+        positions = positions[max(0, len(positions) - keep):]
+
+        # Renumber the states that keep a Q-value, in order of first use
+        width = self.width
+        numbers = array("i", [EMPTY_KEY]) * len(self.heads)
+        piles = array("q")
+        for position in positions:
+            number = self.pair_states[position]
+            if numbers[number] == EMPTY_KEY:
+                numbers[number] = len(piles) // width
+                piles.extend(self.piles[number * width:(number + 1) * width])
+        self.piles = piles
+        self.heads = array("i", [EMPTY_KEY]) * (len(piles) // width)
+
+        # The tables shrink with the store, but no smaller than 8 slots
+        self.index_states(self.capacity(len(self.heads)))
+        self.move_pairs(self.capacity(keep), positions, numbers)
+
+    @classmethod
+    def capacity(cls, count):
+        """
+        Return the smallest table size, a power of two and at least 8,
+        that holds `count` items at most two thirds full.
+        """
+        capacity = 8
+        while 3 * count > 2 * capacity:
+            capacity *= 2
+        return capacity
+
+    def best_future_reward(self, state):
+        """
+        Given a state `state`, return the maximum Q-value of the
+        actions available in it, counting unstored actions as 0,
+        or 0 if there are no actions.
+        """
+        found = self.stored(state)
+        if not found:
+            return 0
+        best = max(found)[0]
+        if len(found) < sum(state):
+            return max(best, 0)
+        return best
+
+    def choose_action(self, state, epsilon=True):
+        """
+        Given a state `state`, return an action `(i, j)` to take.
+
+        If `epsilon` is `False`, then return the best action
+        available in the state, counting unstored actions as 0.
+        If `epsilon` is `True`, then with probability `self.epsilon`
+        choose a random available action, otherwise choose the best
+        action available.
+        """
+        if epsilon and random.random() < self.epsilon:
+            return self.random_action(state)
+
+        found = self.stored(state)
+        if not found:
+            return self.random_action(state)
+
+        # Unstored actions count as 0, so the best stored action only
+        # wins if it is positive or every action is stored
+        value, best = max(found)
+        if value > 0 or len(found) == sum(state):
+            return self.action(best)
+
+        # Break ties between unstored actions at random; fall back to
+        # scanning when most actions are stored
+        stored = {code for _, code in found}
+        for _ in range(8):
+            action = self.random_action(state)
+            if self.action_code(action) not in stored:
+                return action
+        for action in Nim.iter_actions(state):
+            if self.action_code(action) not in stored:
+                return action
+
+    @classmethod
+    def random_action(cls, state):
+        """
+        Return an action chosen uniformly from those available in
+        `state`, without building the set of them.
+        """
+        i = random.choices(range(len(state)), weights=state)[0]
+        return (i, random.randint(1, state[i]))
+
+    def items(self):
+        """
+        Yield `((state, action), value)` for every stored Q-value.
+        """
+        width = self.width
+        for position in self.occupied():
+            base = self.pair_states[position] * width
+            state = tuple(self.piles[base:base + width])
+            yield ((state, self.action(self.pair_actions[position])),
+                   self.values[position])
+
+
+def train(n, player=None, workers=1, report_every=None, initial=None,
+          window=None, history=None):
     """
     Train an AI by playing `n` games against itself.
+
+    Trains a new NimAI unless another AI, such as a DenseNimAI,
+    is given as `player`. Games start from the piles `initial`, by
+    default the AI's own `initial` piles if it has them and
+    [1, 3, 5, 7] otherwise.
+
+    Progress is printed every `report_every` games (by default every
+    tenth of `n`; 0 for silence).
+
+    If `workers` is more than 1, games are played in rounds across
+    worker processes, each of which gets a copy of the AI once, at the
+    start. In each round every worker plays its share of games on its
+    copy, learning as it goes, and sends back the new Q-value of each
+    `(state, action)` pair it updated. Where several workers updated a
+    pair, their values are averaged; the merged values are stored in
+    `player` and sent to every worker before the next round, so the
+    copies stay in step without replaying any game in this process.
+
+    If `window` is given, the AI is checked against optimal play every
+    `window` games (with `workers`, at the end of the first round that
+    reaches it), and a dict is appended to the list `history`, if given,
+    with the games played so far, the largest change in any Q-value
+    since the last check, the win rate from `win_rate` and the number of
+    suboptimal states from `policy_errors`. Training stops early once no
+    state is suboptimal.
     """
 
-    player = NimAI()
+    if player is None:
+        player = NimAI()
+    if initial is None:
+        initial = getattr(player, "initial", [1, 3, 5, 7])
+    if report_every is None:
+        report_every = max(1, n // 10)
 
-    # Play n games
-    for i in range(n):
-        print(f"Playing training game {i + 1}")
-        game = Nim()
+    played = 0
+    checked = 0
+    before = _q_snapshot(player) if window else None
 
-        # Keep track of last move made by either player
-        last = {
-            0: {"state": None, "action": None},
-            1: {"state": None, "action": None}
+    def check():
+        """
+        Record a window's convergence statistics if one has ended, and
+        return True if the AI already plays optimally.
+        """
+        nonlocal before, checked
+        if not window or played // window == checked // window:
+            return False
+        checked = played
+        after = _q_snapshot(player)
+        errors, states = policy_errors(player, initial)
+        record = {
+            "games": played,
+            "delta": _q_delta(before, after),
+            "win_rate": win_rate(player, initial=initial),
+            "errors": errors,
+            "states": states
         }
+        before = after
+        if history is not None:
+            history.append(record)
+        if report_every:
+            print(f"After {played} games: largest Q change "
+                  f"{record['delta']:.4f}, win rate {record['win_rate']:.0%}, "
+                  f"{errors} of {states} states suboptimal")
+        return errors == 0
 
-        # Game loop
-        while True:
+    if workers == 1:
+        while played < n:
+            play_training_game(player, initial=initial)
+            played += 1
+            if report_every and played % report_every == 0:
+                print(f"Played {played} of {n} training games")
+            if check():
+                break
+    else:
 
-            # Keep track of current state and action
-            state = game.piles.copy()
-            action = player.choose_action(game.piles)
+        # Keep rounds small enough that workers learn from each other often
+        per_worker = max(1, min(1000, n // (workers * 10)))
+        reported = 0
+        connections = []
+        processes = []
+        try:
+            for _ in range(workers):
+                connection, child = multiprocessing.Pipe()
+                process = multiprocessing.Process(
+                    target=_training_worker, args=(child, player, initial),
+                    daemon=True
+                )
+                process.start()
+                child.close()
+                connections.append(connection)
+                processes.append(process)
 
-            # Keep track of last state and action
-            last[game.player]["state"] = state
-            last[game.player]["action"] = action
+            merged = dict()
+            while played < n:
+                shares = []
+                for _ in range(workers):
+                    shares.append(max(0, min(per_worker,
+                                             n - played - sum(shares))))
+                for connection, share in zip(connections, shares):
+                    connection.send((share, merged))
+                merged = _merge_q_values(
+                    [connection.recv() for connection in connections]
+                )
+                _set_q_values(player, merged)
+                played += sum(shares)
+                if report_every and played // report_every > reported:
+                    reported = played // report_every
+                    print(f"Played {played} of {n} training games")
+                if check():
+                    break
+        finally:
+            for connection in connections:
+                try:
+                    connection.send(None)
+                except OSError:
+                    pass
+                connection.close()
+            for process in processes:
+                process.join()
+
+    player.games += played
+    if report_every:
+        if played < n:
+            print(f"Play is optimal; stopped after {played} of {n} games")
+        print("Done training")
+
+    # Return the trained AI
+    return player
+
+
+def play_training_game(player, transitions=None, initial=[1, 3, 5, 7]):
+    """
+    Play one game of `player` against itself from the piles `initial`,
+    updating its Q-values after every move. Each update's arguments are
+    also appended to the list `transitions`, if given.
+    """
+    game = Nim(initial)
 
-            # Make move
-            game.move(action)
-            new_state = game.piles.copy()
+    def update(*transition):
+        player.update(*transition)
+        if transitions is not None:
+            transitions.append(transition)
 
-            # When game is over, update Q values with rewards
-            if game.winner is not None:
-                player.update(state, action, new_state, -1)
-                player.update(
+    # Keep track of last move made by either player
+    last = {
+        0: {"state": None, "action": None},
+        1: {"state": None, "action": None}
+    }
+
+    # Game loop
+    while True:
+
+        # Keep track of current state and action
+        state = game.piles.copy()
+        action = player.choose_action(game.piles)
+
+        # Keep track of last state and action
+        last[game.player]["state"] = state
+        last[game.player]["action"] = action
+
+        # Make move
+        game.move(action)
+        new_state = game.piles.copy()
+
+        # When game is over, update Q values with rewards
+        if game.winner is not None:
+            update(state, action, new_state, -1)
+            if last[game.player]["state"] is not None:
+                update(
                     last[game.player]["state"],
                     last[game.player]["action"],
                     new_state,
                     1
                 )
-                break
+            break
 
-            # If game is continuing, no rewards yet
-            elif last[game.player]["state"] is not None:
-                player.update(
-                    last[game.player]["state"],
-                    last[game.player]["action"],
-                    new_state,
-                    0
-                )
+        # If game is continuing, no rewards yet
+        elif last[game.player]["state"] is not None:
+            update(
+                last[game.player]["state"],
+                last[game.player]["action"],
+                new_state,
+                0
+            )
 
-    print("Done training")
 
-    # Return the trained AI
+def _training_worker(connection, player, initial):
+    """
+    Play training games from the piles `initial` on this worker's copy
+    of `player` for `train`.
+
+    Each message from `connection` is a number of games to play and the
+    merged Q-values of the last round to store first; the reply maps
+    each `(state, action)` pair updated in those games to its new
+    Q-value. None ends the worker.
+    """
+    # Forked workers inherit the parent's random state; reseed so that
+    # they do not all play the same games
+    random.seed()
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        n, merged = message
+        _set_q_values(player, merged)
+        transitions = []
+        for _ in range(n):
+            play_training_game(player, transitions, initial)
+        updated = {(tuple(state), action)
+                   for state, action, _, _ in transitions}
+        connection.send({(state, action): player.get_q_value(state, action)
+                         for state, action in updated})
+    connection.close()
+
+
+def _merge_q_values(tables):
+    """
+    Merge the updated Q-values sent back by the workers of a round,
+    averaging the values of pairs that several workers updated.
+    """
+    totals = dict()
+    counts = dict()
+    for table in tables:
+        for key, value in table.items():
+            totals[key] = totals.get(key, 0) + value
+            counts[key] = counts.get(key, 0) + 1
+    return {key: total / counts[key] for key, total in totals.items()}
+
+
+def _set_q_values(ai, values):
+    """
+    Store the Q-values `values`, keyed by `(state, action)`, in `ai`.
+    """
+    for (state, action), value in values.items():
+        if isinstance(ai, DenseNimAI):
+            ai.q[ai.state_index(state), ai.action_index(action)] = value
+        elif isinstance(ai, SparseNimAI):
+            ai.set_q_value(state, action, value)
+        else:
+            ai.q[(state, action)] = value
+
+
+def train_dense(n, initial=[1, 3, 5, 7], batch_size=256):
+    """
+    Train a DenseNimAI by playing `n` games against itself,
+    `batch_size` games at a time.
+    """
+    player = DenseNimAI(initial)
+    player.self_play(n, batch_size)
+    print("Done training")
     return player
 
 
-def play(ai, human_player=None):
+def losing(piles):
+    """
+    Return True if the player to move from `piles` loses against
+    perfect play, where whoever takes the last object loses.
+
+    Once every pile holds at most one object, the player to move loses
+    if an odd number of objects remain; otherwise they lose exactly when
+    the nim-sum (the XOR of the piles) is 0.
+    """
+    if all(pile <= 1 for pile in piles):
+        return sum(piles) % 2 == 1
+    nim_sum = 0
+    for pile in piles:
+        nim_sum ^= pile
+    return nim_sum == 0
+
+
+def winning_actions(piles):
+    """
+    Return the list of actions from `piles` that leave the opponent
+    in a losing position; empty if the player to move cannot win.
+    """
+    actions = []
+    for i, j in Nim.iter_actions(piles):
+        after = list(piles)
+        after[i] -= j
+        if losing(after):
+            actions.append((i, j))
+    return actions
+
+
+def optimal_action(piles):
+    """
+    Return an action for a perfect player from `piles`: a random
+    winning action if there is one, otherwise a random action.
+    """
+    actions = winning_actions(piles)
+    if actions:
+        return random.choice(actions)
+    i = random.choices(range(len(piles)), weights=piles)[0]
+    return (i, random.randint(1, piles[i]))
+
+
+def policy_errors(ai, initial=[1, 3, 5, 7], limit=100000):
+    """
+    Return `(errors, states)`: the number of winnable states reachable
+    from the piles `initial` in which the greedy action of `ai` is not
+    a winning one, and the number of winnable states checked.
+
+    If there are more than `limit` states, `limit` of them are sampled
+    at random instead.
+    """
+    ranges = [range(pile + 1) for pile in initial]
+    if math.prod(len(r) for r in ranges) <= limit:
+        states = itertools.product(*ranges)
+    else:
+        states = (tuple(random.choice(r) for r in ranges)
+                  for _ in range(limit))
+
+    errors = 0
+    checked = 0
+    for state in states:
+        piles = list(state)
+        if not any(piles) or losing(piles):
+            continue
+        checked += 1
+        i, j = ai.choose_action(piles, epsilon=False)
+        piles[i] -= j
+        if not losing(piles):
+            errors += 1
+    return errors, checked
+
+
+def win_rate(ai, games=100, initial=[1, 3, 5, 7]):
+    """
+    Return the fraction of `games` games from the piles `initial` that
+    `ai`, playing greedily, wins against `optimal_action`.
+
+    The AI takes whichever side can force a win, so an AI that plays
+    optimally wins every game.
+    """
+    ai_player = 1 if losing(initial) else 0
+    wins = 0
+    for _ in range(games):
+        game = Nim(initial)
+        while game.winner is None:
+            if game.player == ai_player:
+                game.move(ai.choose_action(game.piles, epsilon=False))
+            else:
+                game.move(optimal_action(game.piles))
+        wins += game.winner == ai_player
+    return wins / games
+
+
+def _q_snapshot(ai):
+    """
+    Return a copy of the Q-values of `ai` for `_q_delta`.
+    """
+    if isinstance(ai, DenseNimAI):
+        return ai.q.copy()
+    if isinstance(ai, SparseNimAI):
+        return dict(ai.items())
+    return dict(ai.q)
+
+
+def _q_delta(before, after):
+    """
+    Return the largest absolute change in any Q-value between two
+    snapshots, counting missing Q-values as 0.
+    """
+    if isinstance(after, np.ndarray):
+        return float(np.abs(after - before).max()) if after.size else 0.0
+    delta = 0.0
+    for key, value in after.items():
+        delta = max(delta, abs(value - before.get(key, 0)))
+    for key, value in before.items():
+        if key not in after:
+            delta = max(delta, abs(value))
+    return delta
+
+
+# Magic bytes and format version of saved AI files
+MAGIC = b"NIMQ"
+VERSION = 1
+
+
+def save_ai(ai, path):
+    """
+    Save the Q-values and training parameters of a NimAI, DenseNimAI
+    or SparseNimAI to the file `path`.
+
+    The file holds MAGIC, a version number, and a JSON header with the
+    training parameters, followed by the Q-values: the raw little-endian
+    float64 table for a DenseNimAI, or one packed record per
+    `(state, action)` entry otherwise.
+    """
+    header = {"alpha": ai.alpha, "epsilon": ai.epsilon, "games": ai.games}
+    if isinstance(ai, DenseNimAI):
+        header["kind"] = "dense"
+        header["initial"] = ai.initial
+        payload = ai.q.astype("<f8").tobytes()
+    else:
+        if isinstance(ai, SparseNimAI):
+            header["kind"] = "sparse"
+            header["initial"] = ai.initial
+            header["max_entries"] = ai.max_entries
+            entries = list(ai.items())
+        else:
+            header["kind"] = "dict"
+            entries = list(ai.q.items())
+        piles = len(entries[0][0][0]) if entries else 0
+        header["piles"] = piles
+        header["entries"] = len(entries)
+        record = struct.Struct(f"<{piles}III d")
+        payload = b"".join(record.pack(*state, i, j, value)
+                           for (state, (i, j)), value in entries)
+
+    header = json.dumps(header).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<HI", VERSION, len(header)))
+        f.write(header)
+        f.write(payload)
+
+
+def load_ai(path):
+    """
+    Load an AI saved with `save_ai` from the file `path`.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if data[:len(MAGIC)] != MAGIC:
+        raise Exception("Not a Nim AI file")
+    version, length = struct.unpack_from("<HI", data, len(MAGIC))
+    if version != VERSION:
+        raise Exception(f"Unsupported Nim AI file version {version}")
+    start = len(MAGIC) + struct.calcsize("<HI")
+    header = json.loads(data[start:start + length].decode("utf-8"))
+    payload = data[start + length:]
+
+    if header["kind"] == "dense":
+        ai = DenseNimAI(header["initial"], header["alpha"], header["epsilon"])
+        ai.q = np.frombuffer(payload, dtype="<f8").reshape(ai.q.shape).copy()
+    else:
+        if header["kind"] == "sparse":
+            ai = SparseNimAI(header["initial"], header["alpha"],
+                             header["epsilon"], header["max_entries"])
+        else:
+            ai = NimAI(header["alpha"], header["epsilon"])
+        piles = header["piles"]
+        record = struct.Struct(f"<{piles}III d")
+        for values in record.iter_unpack(payload):
+            state = tuple(values[:piles])
+            action = (values[piles], values[piles + 1])
+            if isinstance(ai, SparseNimAI):
+                ai.set_q_value(state, action, values[-1])
+            else:
+                ai.q[(state, action)] = values[-1]
+    ai.games = header["games"]
+    return ai
+
+
+def play(ai, human_player=None, initial=[1, 3, 5, 7]):
     """
-    Play human game against the AI.
+    Play human game against the AI, starting from the piles `initial`.
     `human_player` can be set to 0 or 1 to specify whether
     human player moves first or second.
     """
@@ -249,7 +1255,7 @@ def play(ai, human_player=None):
         human_player = random.randint(0, 1)
 
     # Create new game
-    game = Nim()
+    game = Nim(initial)
 
     # Game loop
     while True:
@@ -261,8 +1267,6 @@ def play(ai, human_player=None):
             print(f"Pile {i}: {pile}")
         print()
 
-        # Compute available actions
-        available_actions = Nim.available_actions(game.piles)
         time.sleep(1)
 
         # Let human make a move
@@ -271,7 +1275,7 @@ def play(ai, human_player=None):
             while True:
                 pile = int(input("Choose Pile: "))
                 count = int(input("Choose Count: "))
-                if (pile, count) in available_actions:
+                if Nim.is_available(game.piles, (pile, count)):
                     break
                 print("Invalid move, try again.")
 
@@ -1,4 +1,13 @@
-from nim import train, play
+import os
 
-ai = train(10000)
+from nim import train, play, save_ai, load_ai
+
+# Trained AI saved by a previous run, reused instead of retraining
+MODEL = "nim.model"
+
+if os.path.exists(MODEL):
+    ai = load_ai(MODEL)
+else:
+    ai = train(10000, window=1000)
+    save_ai(ai, MODEL)
 play(ai)
@@ -0,0 +1,246 @@
+"""
+Tic Tac Toe state as a pair of 9-bit integers
+
+A state is a tuple `(x, o)` where bit `3 * i + j` of `x` (or `o`) is set
+if X (or O) has played cell (i, j). The functions below mirror those in
+tictactoe.py, but states are immutable ints, so moves never copy a board
+and wins are checked with a table lookup. Board conversion, turns and
+moves are those of the general m,n,k-game engine in mnk.py.
+"""
+import math
+
+from mnk import EMPTY, MNKGame, O, X
+
+# The 3,3,3-game; board conversion, turns and moves come from its engine
+GAME = MNKGame(3, 3, 3)
+
+# Mask with every cell set
+FULL = GAME.full
+
+# Masks of the 8 winning lines
+LINES = GAME.lines
+
+# WINS[mask] is True if the cells in `mask` contain a full line
+WINS = [any(mask & line == line for line in LINES) for mask in range(1 << 9)]
+
+# Cells in the order alpha-beta search tries them: center, corners, edges
+MOVE_ORDER = [4, 0, 2, 6, 8, 1, 3, 5, 7]
+
+# Cell indices of the board under each of its 4 rotations and their
+# reflections: cell k of the transformed board is cell symmetry[k]
+SYMMETRIES = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8],
+    [6, 3, 0, 7, 4, 1, 8, 5, 2],
+    [8, 7, 6, 5, 4, 3, 2, 1, 0],
+    [2, 5, 8, 1, 4, 7, 0, 3, 6],
+    [2, 1, 0, 5, 4, 3, 8, 7, 6],
+    [0, 3, 6, 1, 4, 7, 2, 5, 8],
+    [6, 7, 8, 3, 4, 5, 0, 1, 2],
+    [8, 5, 2, 7, 4, 1, 6, 3, 0],
+]
+
+# TRANSFORMS[s][mask] is `mask` with its cells moved by SYMMETRIES[s]
+TRANSFORMS = [
+    [sum(1 << k for k in range(9) if mask >> symmetry[k] & 1)
+     for mask in range(1 << 9)]
+    for symmetry in SYMMETRIES
+]
+
+# Kinds of value stored in a transposition table entry
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Shared transposition table: canonical state -> (value, bound)
+transposition_table = {}
+
+# Counters from the most recent call to minimax
+stats = {"nodes": 0, "hits": 0}
+
+
+initial_state = GAME.initial_state
+from_board = GAME.from_board
+to_board = GAME.to_board
+player = GAME.player
+actions = GAME.actions
+result = GAME.result
+
+
+def winner(state):
+    """
+    Returns the winner of the game, if there is one.
+    """
+    if WINS[state[0]]:
+        return X
+    if WINS[state[1]]:
+        return O
+    return None
+
+
+def terminal(state):
+    """
+    Returns True if game is over, False otherwise.
+    """
+    x, o = state
+    return WINS[x] or WINS[o] or (x | o) == FULL
+
+
+def utility(state):
+    """
+    Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
+    """
+    if WINS[state[0]]:
+        return 1
+    if WINS[state[1]]:
+        return -1
+    return 0
+
+
+def canonical(x, o):
+    """
+    Returns a single int encoding the position that is the same for
+    all 8 rotations and reflections of it.
+    """
+    return min(transform[x] | transform[o] << 9 for transform in TRANSFORMS)
+
+
+def minimax(state, table=transposition_table):
+    """
+    Returns the optimal action for the current player on the board,
+    using alpha-beta search with move ordering.
+
+    Solved positions are stored in `table`, keyed by `canonical`, and
+    reused on later calls; pass None to search without a table. The
+    number of positions visited and table hits are left in `stats`.
+    """
+    stats["nodes"] = 0
+    stats["hits"] = 0
+    if terminal(state):
+        return None
+
+    x, o = state
+    x_to_move = bin(x).count("1") == bin(o).count("1")
+    taken = x | o
+
+    # Solve each child exactly so that later calls from this position
+    # are answered from the table
+    best_cell = None
+    best_val = None
+    for cell in MOVE_ORDER:
+        bit = 1 << cell
+        if taken & bit:
+            continue
+        if x_to_move:
+            val = alpha_beta_min(x | bit, o, -math.inf, math.inf, table)
+            better = best_val is None or val > best_val
+        else:
+            val = alpha_beta_max(x, o | bit, -math.inf, math.inf, table)
+            better = best_val is None or val < best_val
+        if better:
+            best_val = val
+            best_cell = cell
+    return divmod(best_cell, 3)
+
+
+def alpha_beta_max(x, o, alpha, beta, table=None):
+    """
+    Returns the value of the position for X to move, ignoring lines that
+    cannot beat `alpha` or that O would never allow past `beta`.
+    """
+    stats["nodes"] += 1
+    if WINS[o]:
+        return -1
+    taken = x | o
+    if taken == FULL:
+        return 0
+
+    if table is not None:
+        key = canonical(x, o)
+        cutoff = _probe(table, key, alpha, beta)
+        if cutoff is not None:
+            return cutoff
+    original_alpha = alpha
+
+    max_val = -math.inf
+    for cell in MOVE_ORDER:
+        bit = 1 << cell
+        if taken & bit:
+            continue
+        val = alpha_beta_min(x | bit, o, alpha, beta, table)
+        if val > max_val:
+            max_val = val
+        if val > alpha:
+            alpha = val
+        if alpha >= beta:
+            break
+
+    if table is not None:
+        _store(table, key, max_val, original_alpha, beta)
+    return max_val
+
+
+def alpha_beta_min(x, o, alpha, beta, table=None):
+    """
+    Returns the value of the position for O to move; the mirror of
+    `alpha_beta_max`.
+    """
+    stats["nodes"] += 1
+    if WINS[x]:
+        return 1
+    taken = x | o
+    if taken == FULL:
+        return 0
+
+    if table is not None:
+        key = canonical(x, o)
+        cutoff = _probe(table, key, alpha, beta)
+        if cutoff is not None:
+            return cutoff
+    original_beta = beta
+
+    min_val = math.inf
+    for cell in MOVE_ORDER:
+        bit = 1 << cell
+        if taken & bit:
+            continue
+        val = alpha_beta_max(x, o | bit, alpha, beta, table)
+        if val < min_val:
+            min_val = val
+        if val < beta:
+            beta = val
+        if alpha >= beta:
+            break
+
+    if table is not None:
+        _store(table, key, min_val, alpha, original_beta)
+    return min_val
+
+
+def _probe(table, key, alpha, beta):
+    """
+    Returns the stored value of a position if it decides the search
+    within (alpha, beta), otherwise None.
+    """
+    entry = table.get(key)
+    if entry is None:
+        return None
+    value, bound = entry
+    if (bound == EXACT
+            or (bound == LOWER and value >= beta)
+            or (bound == UPPER and value <= alpha)):
+        stats["hits"] += 1
+        return value
+    return None
+
+
+def _store(table, key, value, alpha, beta):
+    """
+    Records the value of a position searched within (alpha, beta).
+    A value outside the window is only a bound on the true value.
+    """
+    if value <= alpha:
+        table[key] = (value, UPPER)
+    elif value >= beta:
+        table[key] = (value, LOWER)
+    else:
+        table[key] = (value, EXACT)
@@ -0,0 +1,315 @@
+"""
+m,n,k-game player
+
+Generalizes the Tic Tac Toe engine to an m-row by n-column board where
+k in a row wins; Tic Tac Toe is the 3,3,3-game. Boards larger than 3x3
+are too big to search exhaustively, so `best_move` runs iterative
+deepening alpha-beta with a heuristic evaluation and returns the best
+move found within a time budget.
+
+States are `(x, o)` pairs of ints with bit `i * n + j` set for each cell
+(i, j) a player holds, as in bitboard.py.
+"""
+import math
+import sys
+import time
+
+X = "X"
+O = "O"
+EMPTY = None
+
+# Score of a won position, minus the number of plies it takes to reach,
+# so quicker wins are preferred; heuristic scores stay well below it
+WIN = 10 ** 9
+
+
+class Timeout(Exception):
+    """Raised inside the search when the time budget runs out."""
+
+
+class MNKGame():
+
+    def __init__(self, m=3, n=3, k=3):
+        """
+        Initialize an m-row, n-column board where k in a row wins.
+        """
+        if not (1 <= k <= max(m, n)):
+            raise ValueError("k must fit on the board")
+        self.m = m
+        self.n = n
+        self.k = k
+        self.cells = m * n
+        self.full = (1 << self.cells) - 1
+
+        # Masks of every line of k cells, and the lines through each cell
+        self.lines = []
+        for i in range(m):
+            for j in range(n):
+                for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_i = i + di * (k - 1)
+                    end_j = j + dj * (k - 1)
+                    if 0 <= end_i < m and 0 <= end_j < n:
+                        self.lines.append(sum(
+                            1 << ((i + di * step) * n + j + dj * step)
+                            for step in range(k)
+                        ))
+        self.lines_through = [
+            [line for line in self.lines if line >> cell & 1]
+            for cell in range(self.cells)
+        ]
+
+        # Try central cells first; they lie on the most lines
+        self.move_order = sorted(
+            range(self.cells),
+            key=lambda cell: (-len(self.lines_through[cell]),
+                              abs(cell // n - (m - 1) / 2)
+                              + abs(cell % n - (n - 1) / 2))
+        )
+
+        # Heuristic weight of a line holding c stones of only one player
+        self.weights = [0] + [10 ** (c - 1) for c in range(1, k)] + [0]
+
+        # Positions searched between looks at the clock; each costs about
+        # one step per line and per cell, so big boards look more often
+        # to keep overruns of the time budget small
+        self.check_interval = max(1, 2048 // (len(self.lines) + self.cells))
+
+        # Counters from the most recent call to best_move
+        self.stats = {"nodes": 0, "depth": 0}
+        self.deadline = math.inf
+
+    def initial_state(self):
+        """
+        Returns starting state of the board.
+        """
+        return (0, 0)
+
+    def from_board(self, board):
+        """
+        Returns the state of a list-of-lists board.
+        """
+        x = o = 0
+        for i in range(self.m):
+            for j in range(self.n):
+                if board[i][j] == X:
+                    x |= 1 << (i * self.n + j)
+                elif board[i][j] == O:
+                    o |= 1 << (i * self.n + j)
+        return (x, o)
+
+    def to_board(self, state):
+        """
+        Returns the list-of-lists board for a state.
+        """
+        x, o = state
+        n = self.n
+        return [[X if x >> (i * n + j) & 1 else O if o >> (i * n + j) & 1
+                 else EMPTY for j in range(n)] for i in range(self.m)]
+
+    def player(self, state):
+        """
+        Returns player who has the next turn on a board.
+        """
+        x, o = state
+        return X if bin(x).count("1") == bin(o).count("1") else O
+
+    def actions(self, state):
+        """
+        Returns set of all possible actions (i, j) available on the board.
+        """
+        taken = state[0] | state[1]
+        return {divmod(cell, self.n) for cell in range(self.cells)
+                if not taken >> cell & 1}
+
+    def result(self, state, action):
+        """
+        Returns the board that results from making move (i, j) on the board.
+        """
+        i, j = action
+        x, o = state
+        if not (0 <= i < self.m and 0 <= j < self.n):
+            raise Exception("invalid action")
+        bit = 1 << (i * self.n + j)
+        if (x | o) & bit:
+            raise Exception("cell already taken")
+        if bin(x).count("1") == bin(o).count("1"):
+            return (x | bit, o)
+        return (x, o | bit)
+
+    def winner(self, state):
+        """
+        Returns the winner of the game, if there is one.
+        """
+        x, o = state
+        for line in self.lines:
+            if x & line == line:
+                return X
+            if o & line == line:
+                return O
+        return None
+
+    def terminal(self, state):
+        """
+        Returns True if game is over, False otherwise.
+        """
+        return (self.winner(state) is not None
+                or (state[0] | state[1]) == self.full)
+
+    def utility(self, state):
+        """
+        Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
+        """
+        won = self.winner(state)
+        if won == X:
+            return 1
+        if won == O:
+            return -1
+        return 0
+
+    def evaluate(self, state):
+        """
+        Returns a heuristic score of a non-terminal state for X: every line
+        still open to only one player counts for that player, more so
+        the more of it they hold.
+        """
+        return self._evaluate(state[0], state[1])
+
+    def best_move(self, state, budget=1.0, max_depth=None):
+        """
+        Returns the best action (i, j) for the current player found within
+        `budget` seconds, or None if the game is over.
+
+        Searches depth 1, 2, ... until the budget runs out, the depth
+        reaches `max_depth`, or the result of the game is decided, and
+        returns the best move of the deepest completed search. Each
+        iteration tries the previous best move first. The deepest completed
+        depth and the number of positions visited are left in `stats`.
+        """
+        if self.terminal(state):
+            return None
+        self.stats = {"nodes": 0, "depth": 0}
+        self.deadline = time.perf_counter() + budget
+
+        x, o = state
+        me, opp = (x, o) if self.player(state) == X else (o, x)
+        taken = x | o
+        order = [cell for cell in self.move_order if not taken >> cell & 1]
+        best = order[0]
+
+        limit = len(order) if max_depth is None else min(max_depth,
+                                                         len(order))
+        for depth in range(1, limit + 1):
+            try:
+                value, cell = self._root(me, opp, order, depth)
+            except Timeout:
+                break
+            best = cell
+            self.stats["depth"] = depth
+            order.remove(cell)
+            order.insert(0, cell)
+            if abs(value) >= WIN - self.cells:
+                break
+        return divmod(best, self.n)
+
+    def _root(self, me, opp, order, depth):
+        """
+        Returns (value, cell) of the best move for the player holding `me`
+        found by a `depth`-ply search.
+        """
+        alpha = -math.inf
+        best = order[0]
+        for cell in order:
+            bit = 1 << cell
+            if self._won(me | bit, cell):
+                return WIN - 1, cell
+            value = -self._search(opp, me | bit, depth - 1,
+                                  -math.inf, -alpha, 1)
+            if value > alpha:
+                alpha = value
+                best = cell
+        return alpha, best
+
+    def _search(self, me, opp, depth, alpha, beta, ply):
+        """
+        Returns the negamax value of the position for the player holding
+        `me`, who is to move, searched `depth` more plies within
+        (alpha, beta).
+        """
+        self.stats["nodes"] += 1
+        if not self.stats["nodes"] % self.check_interval \
+                and time.perf_counter() > self.deadline:
+            raise Timeout()
+
+        taken = me | opp
+        if taken == self.full:
+            return 0
+
+        # A winning move ends the search; nothing can score higher
+        empty = [cell for cell in self.move_order if not taken >> cell & 1]
+        for cell in empty:
+            if self._won(me | 1 << cell, cell):
+                return WIN - ply - 1
+
+        if depth == 0:
+            return self._evaluate(me, opp)
+
+        best = -math.inf
+        for cell in empty:
+            value = -self._search(opp, me | 1 << cell, depth - 1,
+                                  -beta, -alpha, ply + 1)
+            if value > best:
+                best = value
+            if value > alpha:
+                alpha = value
+            if alpha >= beta:
+                break
+        return best
+
+    def _won(self, stones, cell):
+        """
+        Returns True if `stones` hold a full line through `cell`.
+        """
+        for line in self.lines_through[cell]:
+            if stones & line == line:
+                return True
+        return False
+
+    def _evaluate(self, me, opp):
+        """
+        Returns the heuristic score of a position for the player holding `me`.
+        """
+        weights = self.weights
+        score = 0
+        for line in self.lines:
+            if not line & opp:
+                score += weights[bin(line & me).count("1")]
+            elif not line & me:
+                score -= weights[bin(line & opp).count("1")]
+        return score
+
+
+def main():
+    if len(sys.argv) not in [4, 5]:
+        sys.exit("Usage: python mnk.py m n k [seconds per move]")
+    m, n, k = (int(arg) for arg in sys.argv[1:4])
+    budget = float(sys.argv[4]) if len(sys.argv) == 5 else 1.0
+
+    # Let the computer play itself
+    game = MNKGame(m, n, k)
+    state = game.initial_state()
+    while not game.terminal(state):
+        current = game.player(state)
+        action = game.best_move(state, budget)
+        state = game.result(state, action)
+        print(f"{current} plays {action} "
+              f"(depth {game.stats['depth']}, {game.stats['nodes']} nodes)")
+        for row in game.to_board(state):
+            print(" ".join(cell or "." for cell in row))
+        print()
+
+    winner = game.winner(state)
+    print("Tie." if winner is None else f"{winner} wins.")
+
+
+if __name__ == "__main__":
+    main()
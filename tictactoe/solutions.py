@@ -0,0 +1,120 @@
+"""
+Precomputed best moves for every reachable Tic Tac Toe position
+
+The table has one byte per board in base-3 order (3 ** 9 bytes), where
+cell k of the board contributes 0, 1 or 2 (empty, X, O) times 3 ** k.
+A byte holds `(value + 1) << 4 | cell` for the best move `cell` of a
+non-terminal reachable position, and NO_MOVE otherwise.
+
+Run `python solutions.py` to regenerate the table.
+"""
+import math
+import os
+
+import bitboard
+
+# Default location of the table, next to this file
+PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                    "solutions.bin")
+
+# Table byte for terminal or unreachable positions
+NO_MOVE = 0xFF
+
+SIZE = 3 ** 9
+
+# TERNARY[mask] is the base-3 number with a 1 digit for each bit of mask
+TERNARY = [sum(3 ** k for k in range(9) if mask >> k & 1)
+           for mask in range(1 << 9)]
+
+# Table loaded by `load`; None until first use, b"" if unavailable
+_table = None
+
+
+def index(state):
+    """
+    Returns the position of a bitboard state in the table.
+    """
+    x, o = state
+    return TERNARY[x] + 2 * TERNARY[o]
+
+
+def load(path=PATH):
+    """
+    Returns the table at `path`, reading it on first use. Returns b""
+    if the file is missing or malformed.
+    """
+    global _table
+    if _table is None:
+        try:
+            with open(path, "rb") as f:
+                _table = f.read()
+        except OSError:
+            _table = b""
+        if len(_table) != SIZE:
+            _table = b""
+    return _table
+
+
+def best_action(state):
+    """
+    Returns the stored best action (i, j) for a bitboard state, or None
+    if the table is unavailable or the position is not in it.
+    """
+    table = load()
+    if not table:
+        return None
+    entry = table[index(state)]
+    if entry == NO_MOVE:
+        return None
+    return divmod(entry & 0x0F, 3)
+
+
+def value(state):
+    """
+    Returns the stored minimax value of a bitboard state, or None.
+    """
+    table = load()
+    if not table:
+        return None
+    entry = table[index(state)]
+    if entry == NO_MOVE:
+        return None
+    return (entry >> 4) - 1
+
+
+def generate(path=PATH):
+    """
+    Solves every reachable position and writes the table to `path`.
+    """
+    global _table
+    table = bytearray([NO_MOVE]) * SIZE
+    solved = {}
+    stack = [bitboard.initial_state()]
+    seen = set(stack)
+    while stack:
+        state = stack.pop()
+        if bitboard.terminal(state):
+            continue
+
+        x, o = state
+        if bitboard.player(state) == bitboard.X:
+            val = bitboard.alpha_beta_max(x, o, -math.inf, math.inf, solved)
+        else:
+            val = bitboard.alpha_beta_min(x, o, -math.inf, math.inf, solved)
+        i, j = bitboard.minimax(state, solved)
+        table[index(state)] = (val + 1) << 4 | (3 * i + j)
+
+        for action in bitboard.actions(state):
+            child = bitboard.result(state, action)
+            if child not in seen:
+                seen.add(child)
+                stack.append(child)
+
+    with open(path, "wb") as f:
+        f.write(table)
+    _table = bytes(table)
+    return sum(entry != NO_MOVE for entry in table)
+
+
+if __name__ == "__main__":
+    print(f"Solved {generate()} positions")
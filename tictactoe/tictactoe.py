@@ -1,9 +1,13 @@
 """
 Tic Tac Toe Player
 """
-import copy
 import math
 
+import bitboard
+import solutions
+
+from bitboard import stats, transposition_table
+
 X = "X"
 O = "O"
 EMPTY = None
@@ -50,10 +54,12 @@ def result(board, action):
     """
     Returns the board that results from making move (i, j) on the board.
     """
-    if action not in actions(board):
+    i, j = action
+    if not (0 <= i < len(board) and 0 <= j < len(board[i])) \
+            or board[i][j] is not EMPTY:
         raise Exception()
     else:
-        modified_board = copy.deepcopy(board)
+        modified_board = [row.copy() for row in board]
         val = player(board)
         modified_board[action[0]][action[1]] = val
         return modified_board
@@ -117,10 +123,29 @@ def utility(board):
         return 0
 
 
-def minimax(board):
+def minimax(board, pruning=True, table=transposition_table):
     """
     Returns the optimal action for the current player on the board.
-    """
+
+    If `pruning` is True, looks the move up in the precomputed
+    `solutions` table. If the table is missing, converts the board to a
+    `bitboard` state and runs its alpha-beta search with move ordering,
+    storing solved positions in the transposition table `table` (None
+    for no table).
+
+    Otherwise explores the full game tree. The number of positions
+    visited is left in `stats["nodes"]`.
+    """
+    if pruning:
+        state = bitboard.from_board(board)
+        action = solutions.best_action(state)
+        if action is not None:
+            stats["nodes"] = 0
+            stats["hits"] = 0
+            return action
+        return bitboard.minimax(state, table)
+
+    stats["nodes"] = 0
     if terminal(board):
         return None
 
@@ -133,6 +158,7 @@ def minimax(board):
 
 
 def max_value(board):
+    stats["nodes"] += 1
     if terminal(board):
         return utility(board), None
 
@@ -148,6 +174,7 @@ def max_value(board):
 
 
 def min_value(board):
+    stats["nodes"] += 1
     if terminal(board):
         return utility(board), None
 